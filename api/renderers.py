@@ -0,0 +1,31 @@
+import json
+
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+
+class ORJSONRenderer(BaseRenderer):
+    """
+    JSON renderer backed by orjson, falling back to the standard library
+    encoder when orjson is not installed.
+    """
+
+    media_type = "application/json"
+    format = "json"
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+
+        if orjson is not None:
+            return orjson.dumps(data, default=JSONEncoder().default)
+
+        return json.dumps(
+            data, cls=JSONEncoder, ensure_ascii=False, separators=(",", ":")
+        ).encode()
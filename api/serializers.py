@@ -1,9 +1,14 @@
+from operator import attrgetter
+
 from django.db import transaction
+from django.utils import timezone
+from django.utils.functional import cached_property
 
 from rest_framework import serializers
 
 from apps.countries.models import (
     Country,
+    DatasetGeneration,
     Demonym,
     NativeName,
     Currency,
@@ -11,6 +16,8 @@ from apps.countries.models import (
     CountryLanguage,
     CountryTranslation,
 )
+from apps.countries.signals import suspend_parent_touches, touch_countries
+from core.routers import use_primary
 
 
 class NativeNameSerializer(serializers.ModelSerializer):
@@ -52,6 +59,15 @@ class CountryTranslationSerializer(serializers.ModelSerializer):
 
 
 class CountryReadSerializer(serializers.ModelSerializer):
+    # Related lookups each method field reads, so views can prefetch them once
+    related_lookups = {
+        "name": ["native_names"],
+        "currencies": ["currencies"],
+        "languages": ["languages__language"],
+        "demonyms": ["demonyms"],
+        "translations": ["translations"],
+    }
+
     name = serializers.SerializerMethodField()
     currencies = serializers.SerializerMethodField()
     idd = serializers.SerializerMethodField()
@@ -107,6 +123,44 @@ class CountryReadSerializer(serializers.ModelSerializer):
             "postalCode",
         ]
 
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop("fields", None)
+        super().__init__(*args, **kwargs)
+
+        if fields:
+            for field_name in set(self.fields) - set(fields):
+                self.fields.pop(field_name)
+
+    @classmethod
+    def prefetch_lookups(cls, fields=None):
+        """Return the prefetch lookups needed to render the given fields."""
+
+        lookups = []
+        for field_name, related in cls.related_lookups.items():
+            if not fields or field_name in fields:
+                lookups.extend(related)
+        return lookups
+
+    @cached_property
+    def _getters(self):
+        getters = {}
+        for field_name in self.fields:
+            method = getattr(self, f"get_{field_name}", None)
+            getters[field_name] = method or attrgetter(field_name)
+        if "uid" in getters:
+            getters["uid"] = lambda obj: str(obj.uid)
+        return getters
+
+    def to_representation(self, instance):
+        # Build the document straight from the instance attributes instead of
+        # dispatching every value through its field's get_attribute and
+        # to_representation; every declared field is either a plain model
+        # attribute or a get_<field> method.
+        return {
+            field_name: getter(instance)
+            for field_name, getter in self._getters.items()
+        }
+
     def get_translations(self, obj):
         translations = obj.translations.all()
         return {
@@ -115,7 +169,7 @@ class CountryReadSerializer(serializers.ModelSerializer):
         }
 
     def get_name(self, obj):
-        native_names = NativeName.objects.filter(country=obj)
+        native_names = obj.native_names.all()
         native_dict = {
             nn.language_code: {
                 "official": nn.official_name,
@@ -143,14 +197,16 @@ class CountryReadSerializer(serializers.ModelSerializer):
     def get_languages(self, obj):
         return {
             cl.language.code: cl.language.name
-            for cl in obj.languages.select_related("language").all()
+            for cl in obj.languages.all()
         }
 
     def get_demonyms(self, obj):
+        demonyms = obj.demonyms.all()
         result = {}
         for gender in ["m", "f"]:
-            for d in obj.demonyms.filter(gender=gender):
-                result.setdefault(d.language_code, {})[gender] = d.name
+            for d in demonyms:
+                if d.gender == gender:
+                    result.setdefault(d.language_code, {})[gender] = d.name
         return result
 
     def get_maps(self, obj):
@@ -179,16 +235,22 @@ class CountryReadSerializer(serializers.ModelSerializer):
         return {"format": obj.postal_code_format, "regex": obj.postal_code_regex}
 
     def get_latlng(self, obj):
-        latlng = []
-        latlng.append(obj.latitude)
-        latlng.append(obj.longitude)
-        return latlng
+        return [obj.latitude, obj.longitude]
 
     def get_car(self, obj):
-        car = {}
-        car["signs"] = obj.car_signs
-        car["side"] = obj.car_side
-        return car
+        return {"signs": obj.car_signs, "side": obj.car_side}
+
+
+class CountryResolveSerializer(serializers.Serializer):
+    identifiers = serializers.ListField(
+        child=serializers.CharField(max_length=64),
+        allow_empty=False,
+        max_length=1000,
+    )
+    fields = serializers.ListField(
+        child=serializers.ChoiceField(choices=CountryReadSerializer.Meta.fields),
+        required=False,
+    )
 
 
 class CountryWriteSerializer(serializers.ModelSerializer):
@@ -198,6 +260,15 @@ class CountryWriteSerializer(serializers.ModelSerializer):
     demonyms = DemonymSerializer(many=True, required=False)
     translations = CountryTranslationSerializer(many=True, required=False)
 
+    # Natural key of the rows in each nested list, which updates diff on
+    child_keys = {
+        "native_name": ["language_code"],
+        "currencies": ["code"],
+        "languages": ["code"],
+        "demonyms": ["language_code", "gender"],
+        "translations": ["language_code"],
+    }
+
     class Meta:
         model = Country
         fields = [
@@ -249,15 +320,39 @@ class CountryWriteSerializer(serializers.ModelSerializer):
             "postal_code_regex",
         ]
 
+    def validate(self, attrs):
+        # Nested serializers are partial on PATCH too, but a child row can
+        # only be matched when its whole natural key is given, once
+        errors = {}
+        for field_name, key_fields in self.child_keys.items():
+            seen = set()
+            for item in attrs.get(field_name, []):
+                missing = [name for name in key_fields if name not in item]
+                if missing:
+                    errors[field_name] = f"Every item requires {', '.join(missing)}."
+                    break
+                key = tuple(item[name] for name in key_fields)
+                if key in seen:
+                    errors[field_name] = f"Duplicate item for {', '.join(key)}."
+                    break
+                seen.add(key)
+
+        if errors:
+            raise serializers.ValidationError(errors)
+        return attrs
+
     def create(self, validated_data):
-        with transaction.atomic():
+        with use_primary(), transaction.atomic():
             native_name_data = validated_data.pop("native_name", [])
             currencies_data = validated_data.pop("currencies", [])
             languages_data = validated_data.pop("languages", [])
             demonyms_data = validated_data.pop("demonyms", [])
             translations_data = validated_data.pop("translations", [])
 
-            country = Country.objects.create(**validated_data)
+            country = Country.objects.create(
+                generation=DatasetGeneration.objects.activated().first(),
+                **validated_data,
+            )
 
             for native_name in native_name_data:
                 NativeName.objects.create(country=country, **native_name)
@@ -276,3 +371,151 @@ class CountryWriteSerializer(serializers.ModelSerializer):
                 CountryTranslation.objects.create(country=country, **translation)
 
             return country
+
+    def require_complete(self, field_name, item):
+        """Reject a partial item that would create a new child row."""
+
+        missing = [
+            name
+            for name, field in self.fields[field_name].child.fields.items()
+            if field.required and name not in item
+        ]
+        if missing:
+            raise serializers.ValidationError(
+                {field_name: f"New items require {', '.join(missing)}."}
+            )
+
+    def sync_children(self, country, field_name, model, items):
+        """
+        Diff incoming child rows against the existing ones on their natural
+        key, and write only the rows that were added, changed or removed.
+
+        Returns True when anything was written.
+        """
+
+        key_fields = self.child_keys[field_name]
+        existing = {}
+        stale = []
+        # Read inside the write transaction rather than from the prefetched
+        # rows, which may predate a concurrent update
+        for obj in model.objects.filter(country=country):
+            key = tuple(getattr(obj, name) for name in key_fields)
+            if key in existing:
+                stale.append(obj)
+            else:
+                existing[key] = obj
+
+        now = timezone.now()
+        to_create = []
+        to_update = []
+        update_fields = set()
+        for item in items:
+            key = tuple(item[name] for name in key_fields)
+            obj = existing.pop(key, None)
+            if obj is None:
+                self.require_complete(field_name, item)
+                to_create.append(model(country=country, **item))
+                continue
+
+            changed = [
+                name for name, value in item.items() if getattr(obj, name) != value
+            ]
+            if changed:
+                for name in changed:
+                    setattr(obj, name, item[name])
+                obj.updated_at = now
+                to_update.append(obj)
+                update_fields.update(changed)
+
+        stale.extend(existing.values())
+
+        if to_create:
+            model.objects.bulk_create(to_create)
+        if to_update:
+            model.objects.bulk_update(to_update, [*update_fields, "updated_at"])
+        if stale:
+            model.objects.filter(id__in=[obj.id for obj in stale]).delete()
+
+        return bool(to_create or to_update or stale)
+
+    def sync_languages(self, country, languages_data):
+        """Diff the country's languages on their language code."""
+
+        existing = {
+            cl.language.code: cl
+            for cl in CountryLanguage.objects.filter(country=country).select_related(
+                "language"
+            )
+        }
+        incoming = {language["code"]: language for language in languages_data}
+
+        new_codes = set(incoming) - set(existing)
+        stale = [cl.id for code, cl in existing.items() if code not in incoming]
+
+        if new_codes:
+            languages = {
+                language.code: language
+                for language in Language.objects.filter(code__in=new_codes)
+            }
+            missing = []
+            for code in new_codes:
+                if code not in languages:
+                    self.require_complete("languages", incoming[code])
+                    missing.append(Language(**incoming[code]))
+            for language in Language.objects.bulk_create(missing):
+                languages[language.code] = language
+
+            CountryLanguage.objects.bulk_create(
+                [
+                    CountryLanguage(country=country, language=languages[code])
+                    for code in new_codes
+                ]
+            )
+        if stale:
+            CountryLanguage.objects.filter(id__in=stale).delete()
+
+        return bool(new_codes or stale)
+
+    def update(self, instance, validated_data):
+        children = [
+            ("native_name", NativeName),
+            ("currencies", Currency),
+            ("demonyms", Demonym),
+            ("translations", CountryTranslation),
+        ]
+
+        with use_primary(), transaction.atomic():
+            nested_data = {
+                field_name: validated_data.pop(field_name)
+                for field_name, _ in children
+                if field_name in validated_data
+            }
+            languages_data = validated_data.pop("languages", None)
+
+            changed = [
+                name
+                for name, value in validated_data.items()
+                if getattr(instance, name) != value
+            ]
+            if changed:
+                for name in changed:
+                    setattr(instance, name, validated_data[name])
+                instance.save(update_fields=[*changed, "updated_at"])
+
+            children_changed = False
+            with suspend_parent_touches():
+                for field_name, model in children:
+                    if field_name in nested_data:
+                        children_changed |= self.sync_children(
+                            instance, field_name, model, nested_data[field_name]
+                        )
+                if languages_data is not None:
+                    children_changed |= self.sync_languages(
+                        instance, languages_data
+                    )
+
+            # The parent country is bumped once for all its children
+            if children_changed and not changed:
+                touch_countries([instance.id])
+
+            return instance
@@ -1,12 +1,39 @@
 from django.urls import path
 
-from .views import CountryListCreateView, CountryDetailView
+from .views import (
+    CountryChangesView,
+    CountryListCreateView,
+    CountryDetailView,
+    CountryExportView,
+    CountryResolveView,
+    CountrySimilarView,
+)
 
 urlpatterns = [
     path("/countries", CountryListCreateView.as_view(), name="country-list-create"),
+    path(
+        "/countries/changes",
+        CountryChangesView.as_view(),
+        name="country-changes",
+    ),
+    path(
+        "/countries/export",
+        CountryExportView.as_view(),
+        name="country-export",
+    ),
+    path(
+        "/countries/resolve",
+        CountryResolveView.as_view(),
+        name="country-resolve",
+    ),
     path(
         "/countries/<uuid:country_uid>",
         CountryDetailView.as_view(),
         name="country-detail",
     ),
+    path(
+        "/countries/<uuid:country_uid>/similar",
+        CountrySimilarView.as_view(),
+        name="country-similar",
+    ),
 ]
@@ -1,24 +1,418 @@
-from rest_framework.generics import ListCreateAPIView, RetrieveAPIView
+import math
+from datetime import timezone as dt_timezone
+from functools import partial
 
-from apps.countries.models import Country
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.views import View
 
-from .serializers import CountryReadSerializer, CountryWriteSerializer
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotFound, ValidationError
+from rest_framework.generics import (
+    GenericAPIView,
+    ListCreateAPIView,
+    RetrieveUpdateDestroyAPIView,
+    get_object_or_404,
+)
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
 
+from apps.countries.cache import get_or_compute, request_cache_key
+from apps.countries.changes import (
+    InvalidSyncToken,
+    decode_sync_token,
+    encode_sync_token,
+    next_cursor,
+    retention_horizon,
+)
+from apps.countries.codes import resolve_identifiers
+from apps.countries.export import EXPORT_FORMATS, ExportError, stream_table
+from apps.countries.models import Country, CountryTombstone, DatasetVersion
+from apps.countries.similarity import (
+    FEATURES,
+    SimilarityUnavailable,
+    get_index as get_similarity_index,
+)
+from apps.countries.snapshot import get_snapshot
+from apps.countries.versions import (
+    documents_as_of,
+    list_order,
+    rolled_back_version,
+)
+from core.routers import is_pinned_to_primary
 
-class CountryListCreateView(ListCreateAPIView):
-    queryset = Country.objects.all()
+from .serializers import (
+    CountryReadSerializer,
+    CountryResolveSerializer,
+    CountryWriteSerializer,
+)
+
+
+class SnapshotMixin:
+    """Serve pre-rendered JSON documents from the shared dataset snapshot."""
+
+    # Query parameters the view reads, any other one is ignored
+    read_params = ["format"]
+
+    def get_snapshot(self):
+        # Clients reading their own writes, and non-JSON renderers such as the
+        # browsable API, go through the database and serializers instead
+        if (
+            is_pinned_to_primary()
+            or self.request.accepted_renderer.format != "json"
+            or any(name in self.request.query_params for name in self.read_params)
+        ):
+            return None
+        return get_snapshot()
+
+    # Bytes of the mapping copied into each response chunk
+    chunk_size = 64 * 1024
+
+    def snapshot_response(self, document):
+        # Stream slices of the mapping rather than copying the whole document
+        # into the worker's memory
+        chunks = (
+            document[start : start + self.chunk_size]
+            for start in range(0, len(document), self.chunk_size)
+        )
+        response = StreamingHttpResponse(chunks, content_type="application/json")
+        response["Content-Length"] = str(len(document))
+        return response
+
+
+class CachedResponseMixin:
+    """Cache rendered JSON responses of the read endpoints."""
+
+    # Query parameters the view reads, any other one is ignored
+    read_params = ["format"]
+
+    def cached_response(self, compute):
+        if is_pinned_to_primary() or self.request.accepted_renderer.format != "json":
+            return compute()
+
+        def render():
+            response = compute()
+            response.accepted_renderer = self.request.accepted_renderer
+            response.accepted_media_type = self.request.accepted_media_type
+            response.renderer_context = self.get_renderer_context()
+            response.render()
+            return response.status_code, response.content
+
+        status_code, content = get_or_compute(
+            request_cache_key(self.request, self.read_params),
+            render,
+            cacheable=lambda value: value[0] == status.HTTP_200_OK,
+        )
+        return HttpResponse(
+            content, status=status_code, content_type="application/json"
+        )
+
+
+class DatasetRolledBack(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = (
+        "Readers are rolled back to an older dataset version, writes are "
+        "rejected until the latest version is activated again."
+    )
+    default_code = "dataset_rolled_back"
+
+
+class VersionMixin:
+    """
+    Serve the documents of a past dataset version from the version store, for
+    ``?as_of=<version>`` and while readers are rolled back to an older version.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # Writes go to the tables, which readers do not see while rolled back
+        if request.method not in SAFE_METHODS and rolled_back_version() is not None:
+            raise DatasetRolledBack()
+
+    def get_version(self):
+        as_of = self.request.query_params.get("as_of")
+        if as_of is None:
+            return rolled_back_version()
+
+        try:
+            version_id = int(as_of)
+        except ValueError:
+            raise ValidationError({"as_of": "Expected a dataset version id."})
+        version = DatasetVersion.objects.activated().filter(pk=version_id).first()
+        if version is None:
+            raise NotFound("Unknown dataset version.")
+        return version
+
+
+class CountryListCreateView(
+    SnapshotMixin, CachedResponseMixin, VersionMixin, ListCreateAPIView
+):
+    read_params = ["format", "as_of"]
+    queryset = Country.objects.prefetch_related(
+        *CountryReadSerializer.prefetch_lookups()
+    )
 
     def get_serializer_class(self):
         if self.request.method == "POST":
             return CountryWriteSerializer
         return CountryReadSerializer
 
+    def list(self, request, *args, **kwargs):
+        snapshot = self.get_snapshot()
+        if snapshot is not None:
+            return self.snapshot_response(snapshot.all_documents())
+        return self.cached_response(partial(self.list_as_of, request, *args, **kwargs))
 
-class CountryDetailView(RetrieveAPIView):
-    queryset = Country.objects.all()
+    def list_as_of(self, request, *args, **kwargs):
+        version = self.get_version()
+        if version is None:
+            return super().list(request, *args, **kwargs)
+
+        return Response(sorted(documents_as_of(version).values(), key=list_order))
+
+
+class CountryDetailView(
+    SnapshotMixin, CachedResponseMixin, VersionMixin, RetrieveUpdateDestroyAPIView
+):
+    read_params = ["format", "as_of"]
+    queryset = Country.objects.prefetch_related(
+        *CountryReadSerializer.prefetch_lookups()
+    )
 
     def get_serializer_class(self):
+        if self.request.method in ("PUT", "PATCH"):
+            return CountryWriteSerializer
         return CountryReadSerializer
 
     def get_object(self):
-        return self.get_queryset().get(uid=self.kwargs["country_uid"])
+        obj = get_object_or_404(self.get_queryset(), uid=self.kwargs["country_uid"])
+        self.check_object_permissions(self.request, obj)
+        return obj
+
+    def retrieve(self, request, *args, **kwargs):
+        snapshot = self.get_snapshot()
+        if snapshot is not None:
+            document = snapshot.get_document(self.kwargs["country_uid"])
+            if document is not None:
+                return self.snapshot_response(document)
+        return self.cached_response(
+            partial(self.retrieve_as_of, request, *args, **kwargs)
+        )
+
+    def retrieve_as_of(self, request, *args, **kwargs):
+        version = self.get_version()
+        if version is None:
+            return super().retrieve(request, *args, **kwargs)
+
+        document = documents_as_of(version).get(str(self.kwargs["country_uid"]))
+        if document is None:
+            raise NotFound()
+        return Response(document)
+
+
+class CountryResolveView(GenericAPIView):
+    serializer_class = CountryResolveSerializer
+    # A POST only for the size of its body, it never writes
+    read_only = True
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        fields = serializer.validated_data.get("fields")
+
+        resolved, unresolved = resolve_identifiers(
+            serializer.validated_data["identifiers"]
+        )
+
+        countries = list(
+            Country.objects.filter(
+                id__in={pk for _, pk in resolved.values()}
+            ).prefetch_related(*CountryReadSerializer.prefetch_lookups(fields))
+        )
+        data = CountryReadSerializer(countries, many=True, fields=fields).data
+        documents = {
+            country.id: document for country, document in zip(countries, data)
+        }
+
+        return Response(
+            {
+                "results": [
+                    {
+                        "identifier": identifier,
+                        "type": identifier_type,
+                        "country": documents[pk],
+                    }
+                    for identifier, (identifier_type, pk) in resolved.items()
+                    if pk in documents
+                ],
+                "unresolved": unresolved,
+            }
+        )
+
+
+class CountryChangesView(GenericAPIView):
+    """
+    Incremental sync feed.
+
+    Returns the countries created or updated after ``?updated_since=`` (an ISO
+    8601 timestamp) or ``?sync_token=`` (from a previous response), the uids
+    of countries deleted in that window, and the token for the next call.
+    Without either parameter the full dataset is returned.
+
+    Changes from the last minute may be returned again by the next call, so
+    clients apply them by uid.
+    """
+
+    serializer_class = CountryReadSerializer
+
+    def get_since(self):
+        token = self.request.query_params.get("sync_token")
+        if token:
+            try:
+                return decode_sync_token(token)
+            except InvalidSyncToken as e:
+                raise ValidationError({"sync_token": str(e)})
+
+        updated_since = self.request.query_params.get("updated_since")
+        if updated_since:
+            since = parse_datetime(updated_since)
+            if since is None:
+                raise ValidationError(
+                    {"updated_since": "Expected an ISO 8601 timestamp."}
+                )
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since, dt_timezone.utc)
+            return since
+
+        return None
+
+    def get(self, request, *args, **kwargs):
+        since = self.get_since()
+
+        if since is not None and since < retention_horizon():
+            return Response(
+                {"detail": "Sync token expired, a full sync is required."},
+                status=status.HTTP_410_GONE,
+            )
+
+        countries = Country.objects.prefetch_related(
+            *CountryReadSerializer.prefetch_lookups()
+        ).order_by("updated_at")
+        tombstones = CountryTombstone.objects.none()
+        if since is not None:
+            countries = countries.filter(updated_at__gt=since)
+            tombstones = CountryTombstone.objects.filter(deleted_at__gt=since)
+
+        countries = list(countries)
+        deleted = list(tombstones.values_list("uid", "deleted_at"))
+
+        cursor = next_cursor(
+            since,
+            [country.updated_at for country in countries]
+            + [deleted_at for _, deleted_at in deleted],
+        )
+
+        return Response(
+            {
+                "changed": self.get_serializer(countries, many=True).data,
+                "deleted": [uid for uid, _ in deleted],
+                "sync_token": encode_sync_token(cursor) if cursor else None,
+            }
+        )
+
+
+class CountrySimilarView(GenericAPIView):
+    """
+    Countries most similar to the given one.
+
+    ``?weights=languages:2,borders:0`` overrides the weight of individual
+    features (the others keep a weight of 1), ``?limit=`` sets the number of
+    results.
+    """
+
+    max_limit = 100
+
+    def get_weights(self):
+        raw = self.request.query_params.get("weights")
+        if not raw:
+            return None
+
+        weights = dict.fromkeys(FEATURES, 1.0)
+        for item in raw.split(","):
+            feature, _, value = item.partition(":")
+            if feature not in weights:
+                message = (
+                    f"Unknown feature '{feature}', "
+                    f"expected one of: {', '.join(FEATURES)}"
+                )
+                raise ValidationError({"weights": message})
+            try:
+                weights[feature] = float(value)
+            except ValueError:
+                raise ValidationError({"weights": f"Invalid weight for '{feature}'."})
+            if not math.isfinite(weights[feature]) or weights[feature] < 0:
+                raise ValidationError(
+                    {"weights": "Weights must be finite and not negative."}
+                )
+
+        if not any(weights.values()):
+            raise ValidationError({"weights": "At least one weight must be positive."})
+        return weights
+
+    def get_limit(self):
+        try:
+            limit = int(self.request.query_params.get("limit", 10))
+        except ValueError:
+            raise ValidationError({"limit": "Expected an integer."})
+        return max(1, min(limit, self.max_limit))
+
+    def get(self, request, *args, **kwargs):
+        weights = self.get_weights()
+        limit = self.get_limit()
+
+        try:
+            index = get_similarity_index()
+        except SimilarityUnavailable as e:
+            return Response(
+                {"detail": str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+
+        results = index.similar(str(self.kwargs["country_uid"]), weights, limit)
+        if results is None:
+            raise NotFound()
+
+        return Response(
+            {
+                "uid": str(self.kwargs["country_uid"]),
+                "weights": weights or dict.fromkeys(FEATURES, 1.0),
+                "results": [
+                    {
+                        "uid": country["uid"],
+                        "name": country["name_common"],
+                        "cca3": country["cca3"],
+                        "score": round(score, 4),
+                    }
+                    for country, score in results
+                ],
+            }
+        )
+
+
+class CountryExportView(View):
+    # A plain Django view: DRF reserves ?format= for renderer selection and
+    # would buffer the whole body, while the export has to be streamed.
+
+    def get(self, request, *args, **kwargs):
+        export_format = request.GET.get("format", "csv")
+        table = request.GET.get("table", "countries")
+
+        try:
+            chunks = stream_table(table, export_format)
+        except ExportError as e:
+            return JsonResponse({"detail": str(e)}, status=400)
+
+        content_type, extension = EXPORT_FORMATS[export_format]
+        response = StreamingHttpResponse(chunks, content_type=content_type)
+        response["Content-Disposition"] = f'attachment; filename="{table}.{extension}"'
+        return response
@@ -1,6 +1,8 @@
 from django.contrib import admin
 from .models import (
     Country,
+    DatasetGeneration,
+    DatasetVersion,
     Currency,
     Language,
     CountryLanguage,
@@ -10,18 +12,57 @@ from .models import (
 )
 
 
+class ActiveGenerationChildAdmin(admin.ModelAdmin):
+    """Only lists child rows of countries in the active dataset generation."""
+
+    def get_queryset(self, request):
+        return (
+            super()
+            .get_queryset(request)
+            .filter(country__in=Country.objects.values("id"))
+        )
+
+
+@admin.register(DatasetGeneration)
+class DatasetGenerationAdmin(admin.ModelAdmin):
+    list_display = ("id", "status", "country_count", "created_at", "activated_at")
+    list_filter = ("status",)
+    readonly_fields = ("status", "country_count", "created_at", "activated_at")
+
+
+@admin.register(DatasetVersion)
+class DatasetVersionAdmin(admin.ModelAdmin):
+    list_display = ("id", "generation", "country_count", "created_at", "activated_at")
+    list_select_related = ("generation",)
+    readonly_fields = (
+        "parent",
+        "generation",
+        "country_count",
+        "created_at",
+        "activated_at",
+    )
+
+
 @admin.register(Country)
 class CountryAdmin(admin.ModelAdmin):
     list_display = ("name_common", "capital", "region", "population")
     search_fields = ("name_common", "name_official")
     list_filter = ("region", "subregion", "independent", "un_member")
+    readonly_fields = ("generation",)
+
+    def save_model(self, request, obj, form, change):
+        if not change:
+            obj.generation = DatasetGeneration.objects.activated().first()
+        super().save_model(request, obj, form, change)
 
 
 @admin.register(Currency)
-class CurrencyAdmin(admin.ModelAdmin):
+class CurrencyAdmin(ActiveGenerationChildAdmin):
     list_display = ("code", "name", "symbol", "country")
     search_fields = ("code", "name", "country__name_common")
     list_filter = ("country__region",)
+    list_select_related = ("country",)
+    autocomplete_fields = ("country",)
 
 
 @admin.register(Language)
@@ -31,14 +72,16 @@ class LanguageAdmin(admin.ModelAdmin):
 
 
 @admin.register(CountryLanguage)
-class CountryLanguageAdmin(admin.ModelAdmin):
+class CountryLanguageAdmin(ActiveGenerationChildAdmin):
     list_display = ("country", "language")
     search_fields = ("country__name_common", "language__name")
     list_filter = ("country__region", "language")
+    list_select_related = ("country", "language")
+    autocomplete_fields = ("country", "language")
 
 
 @admin.register(CountryTranslation)
-class CountryTranslationAdmin(admin.ModelAdmin):
+class CountryTranslationAdmin(ActiveGenerationChildAdmin):
     list_display = ("country", "language_code", "common_name", "official_name")
     search_fields = (
         "country__name_common",
@@ -47,10 +90,14 @@ class CountryTranslationAdmin(admin.ModelAdmin):
         "official_name",
     )
     list_filter = ("language_code", "country__region")
+    list_select_related = ("country",)
+    autocomplete_fields = ("country",)
+    # Skip the second, unfiltered COUNT(*) over the whole table on each page
+    show_full_result_count = False
 
 
 @admin.register(NativeName)
-class NativeNameAdmin(admin.ModelAdmin):
+class NativeNameAdmin(ActiveGenerationChildAdmin):
     list_display = ("country", "language_code", "common_name", "official_name")
     search_fields = (
         "country__name_common",
@@ -59,10 +106,16 @@ class NativeNameAdmin(admin.ModelAdmin):
         "official_name",
     )
     list_filter = ("language_code", "country__region")
+    list_select_related = ("country",)
+    autocomplete_fields = ("country",)
+    show_full_result_count = False
 
 
 @admin.register(Demonym)
-class DemonymAdmin(admin.ModelAdmin):
+class DemonymAdmin(ActiveGenerationChildAdmin):
     list_display = ("country", "language_code", "gender", "name")
     search_fields = ("country__name_common", "language_code", "name")
     list_filter = ("language_code", "gender", "country__region")
+    list_select_related = ("country",)
+    autocomplete_fields = ("country",)
+    show_full_result_count = False
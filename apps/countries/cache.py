@@ -0,0 +1,119 @@
+"""
+Response cache for the country read endpoints.
+
+Entries are tagged with a dataset version that every committed write
+replaces, so invalidation is a single cache write. An entry that is stale,
+because it expired or the version moved on, is still served to every worker
+but the one that takes the recompute lock for its key.
+"""
+
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+
+VERSION_KEY = "countries:version"
+
+# How long an entry is served as fresh, and then served stale while it is
+# being recomputed
+FRESH_SECONDS = 300
+STALE_SECONDS = 3600
+
+# Upper bound on a recompute; the lock expires after this if a worker dies
+LOCK_SECONDS = 30
+
+# How long a cold miss waits for another worker's recompute before giving up
+# and computing itself
+WAIT_SECONDS = 5
+
+
+def get_cache():
+    return caches[settings.COUNTRY_CACHE_ALIAS]
+
+
+def request_cache_key(request, param_names):
+    """
+    Key a request on its path and the sorted values of the given query
+    parameters. Other parameters do not change the response, and must not
+    produce an entry of their own.
+    """
+
+    params = sorted(
+        (name, value)
+        for name in request.GET
+        if name in param_names
+        for value in request.GET.getlist(name)
+    )
+    raw = f"{request.path}?{urlencode(params)}"
+    return "countries:response:" + hashlib.sha256(raw.encode()).hexdigest()
+
+
+def current_version(cache):
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, time.time_ns(), None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def invalidate():
+    """Mark every cached response as stale."""
+
+    # A fresh timestamp rather than a counter, so a version evicted from the
+    # cache can never come back with a value older entries still carry
+    get_cache().set(VERSION_KEY, time.time_ns(), None)
+
+
+def get_or_compute(key, compute, cacheable=lambda value: True):
+    """
+    Return the cached value for ``key``, computing it at most once across
+    workers sharing the cache.
+    """
+
+    cache = get_cache()
+    version = current_version(cache)
+    entry = cache.get(key)
+    if entry and entry["version"] == version and time.time() < entry["fresh_until"]:
+        return entry["value"]
+
+    lock_key = f"{key}:lock"
+
+    def recompute():
+        try:
+            value = compute()
+            if cacheable(value):
+                cache.set(
+                    key,
+                    {
+                        "version": version,
+                        "fresh_until": time.time() + FRESH_SECONDS,
+                        "value": value,
+                    },
+                    FRESH_SECONDS + STALE_SECONDS,
+                )
+            return value
+        finally:
+            cache.delete(lock_key)
+
+    if cache.add(lock_key, 1, LOCK_SECONDS):
+        return recompute()
+
+    # Another worker is recomputing: serve stale, or wait for its result
+    if entry:
+        return entry["value"]
+
+    deadline = time.monotonic() + WAIT_SECONDS
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        entry = cache.get(key)
+        if entry and entry["version"] in (version, current_version(cache)):
+            return entry["value"]
+        # The other worker finished without storing a usable entry, for an
+        # older version or an uncacheable response: take over the recompute
+        if cache.add(lock_key, 1, LOCK_SECONDS):
+            version = current_version(cache)
+            return recompute()
+
+    return compute()
@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.utils import timezone
+
+from .models import CountryTombstone
+
+# Tombstones older than this are pruned; clients that last synced before the
+# retention window have to start over with a full sync.
+TOMBSTONE_RETENTION = timedelta(days=30)
+
+# Timestamps are taken when a row is written, not when its transaction
+# commits, so a change can become visible a little after rows with later
+# timestamps. Cursors stay this far behind the present so such a change is
+# still inside the next window.
+COMMIT_LAG = timedelta(seconds=60)
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+class InvalidSyncToken(ValueError):
+    pass
+
+
+def encode_sync_token(cursor):
+    """Encode a change cursor as an opaque token of microseconds since epoch."""
+
+    return str((cursor - EPOCH) // timedelta(microseconds=1))
+
+
+def decode_sync_token(token):
+    try:
+        return EPOCH + timedelta(microseconds=int(token))
+    except (TypeError, ValueError, OverflowError):
+        raise InvalidSyncToken(f"Invalid sync token: {token!r}")
+
+
+def next_cursor(since, timestamps):
+    """
+    Return the cursor of the next sync: the newest change returned, but no
+    later than ``COMMIT_LAG`` ago, and never before ``since``.
+    """
+
+    cursor = max(timestamps, default=None)
+    if cursor is None:
+        return since
+
+    cursor = min(cursor, timezone.now() - COMMIT_LAG)
+    if since is not None:
+        cursor = max(cursor, since)
+    return cursor
+
+
+def retention_horizon():
+    return timezone.now() - TOMBSTONE_RETENTION
+
+
+def prune_tombstones():
+    """Delete tombstones that fell out of the retention window."""
+
+    deleted, _ = CountryTombstone.objects.filter(
+        deleted_at__lt=retention_horizon()
+    ).delete()
+    return deleted
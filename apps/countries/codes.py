@@ -0,0 +1,105 @@
+import threading
+import uuid
+
+from django.db.models import Count, Max
+
+from .models import Country
+
+# Code fields tried, in order, for an identifier of a given shape
+CODE_FIELDS = ["cca2", "cca3", "ccn3", "cioc", "fifa"]
+
+_lock = threading.Lock()
+_index = None
+_index_key = None
+
+
+def detect_identifier_types(identifier):
+    """Return the identifier types an identifier could be, most likely first."""
+
+    try:
+        uuid.UUID(identifier)
+        return ["uid"]
+    except ValueError:
+        pass
+
+    if len(identifier) == 3 and identifier.isdigit():
+        return ["ccn3"]
+    if len(identifier) == 2 and identifier.isalpha():
+        return ["cca2"]
+    if len(identifier) == 3 and identifier.isalpha():
+        return ["cca3", "cioc", "fifa"]
+    return []
+
+
+def normalize_identifier(identifier_type, identifier):
+    if identifier_type == "uid":
+        return str(uuid.UUID(identifier))
+    return identifier.upper()
+
+
+def build_index():
+    """Build a hash map of every code field to the country primary key."""
+
+    index = {identifier_type: {} for identifier_type in ["uid"] + CODE_FIELDS}
+    rows = Country.objects.values_list("id", "uid", *CODE_FIELDS)
+    for pk, uid, *codes in rows.iterator():
+        index["uid"][str(uid)] = pk
+        for field_name, code in zip(CODE_FIELDS, codes):
+            if code:
+                index[field_name].setdefault(code.upper(), pk)
+    return index
+
+
+def dataset_fingerprint():
+    """Return a cheap value that changes whenever the country table changes."""
+
+    # The generation too, as an import that changed nothing keeps every
+    # timestamp but not the primary keys
+    return tuple(
+        Country.objects.aggregate(
+            count=Count("id"),
+            latest=Max("updated_at"),
+            generation=Max("generation_id"),
+        ).values()
+    )
+
+
+def get_index():
+    """Return the code index, rebuilding it when the country table changed."""
+
+    global _index, _index_key
+
+    key = dataset_fingerprint()
+    if _index is None or _index_key != key:
+        with _lock:
+            if _index is None or _index_key != key:
+                _index = build_index()
+                _index_key = key
+    return _index
+
+
+def resolve_identifiers(identifiers):
+    """
+    Resolve mixed country identifiers to primary keys.
+
+    Returns a dict mapping each resolved identifier to a
+    ``(identifier_type, pk)`` tuple, and the list of unresolved identifiers.
+    """
+
+    index = get_index()
+    resolved = {}
+    unresolved = []
+
+    for identifier in identifiers:
+        identifier = identifier.strip()
+        for identifier_type in detect_identifier_types(identifier):
+            pk = index[identifier_type].get(
+                normalize_identifier(identifier_type, identifier)
+            )
+            if pk is not None:
+                resolved[identifier] = (identifier_type, pk)
+                break
+        else:
+            unresolved.append(identifier)
+
+    return resolved, unresolved
@@ -0,0 +1,156 @@
+import csv
+import io
+import json
+import uuid
+from datetime import date, datetime
+
+from .models import (
+    Country,
+    Demonym,
+    NativeName,
+    Currency,
+    CountryLanguage,
+    CountryTranslation,
+)
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+# Rows buffered before a chunk is handed to the response or file
+CHUNK_ROWS = 500
+
+EXPORT_TABLES = {
+    "countries": (
+        Country,
+        [
+            f.name
+            for f in Country._meta.concrete_fields
+            if f.name not in ("id", "generation")
+        ],
+    ),
+    "native_names": (
+        NativeName,
+        ["country__uid", "language_code", "official_name", "common_name"],
+    ),
+    "currencies": (Currency, ["country__uid", "code", "name", "symbol"]),
+    "languages": (
+        CountryLanguage,
+        ["country__uid", "language__code", "language__name"],
+    ),
+    "demonyms": (Demonym, ["country__uid", "language_code", "gender", "name"]),
+    "translations": (
+        CountryTranslation,
+        ["country__uid", "language_code", "official_name", "common_name"],
+    ),
+}
+
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "msgpack": ("application/msgpack", "msgpack"),
+}
+
+
+class ExportError(Exception):
+    pass
+
+
+def _plain(value):
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Cannot export value of type {type(value).__name__}")
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, ensure_ascii=False)
+    if isinstance(value, (uuid.UUID, datetime, date)):
+        return _plain(value)
+    return value
+
+
+def _csv_chunks(columns, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+
+    for count, row in enumerate(rows, start=1):
+        writer.writerow([_csv_value(value) for value in row])
+        if count % CHUNK_ROWS == 0:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue().encode()
+
+
+def _ndjson_chunks(columns, rows):
+    lines = []
+    for row in rows:
+        lines.append(
+            json.dumps(dict(zip(columns, row)), ensure_ascii=False, default=_plain)
+        )
+        if len(lines) == CHUNK_ROWS:
+            yield ("\n".join(lines) + "\n").encode()
+            lines = []
+
+    if lines:
+        yield ("\n".join(lines) + "\n").encode()
+
+
+def _msgpack_chunks(columns, rows):
+    # The column names are packed once, followed by one array per row
+    packer = msgpack.Packer(default=_plain)
+    chunk = [packer.pack(columns)]
+
+    for row in rows:
+        chunk.append(packer.pack(row))
+        if len(chunk) == CHUNK_ROWS:
+            yield b"".join(chunk)
+            chunk = []
+
+    if chunk:
+        yield b"".join(chunk)
+
+
+FORMAT_WRITERS = {
+    "csv": _csv_chunks,
+    "ndjson": _ndjson_chunks,
+    "msgpack": _msgpack_chunks,
+}
+
+
+def stream_table(table, export_format):
+    """
+    Yield an export of one table as encoded chunks.
+
+    Rows are read straight from a ``values_list()`` iterator, so memory use
+    does not grow with the size of the table.
+    """
+
+    if table not in EXPORT_TABLES:
+        raise ExportError(
+            f"Unknown table '{table}', expected one of: {', '.join(EXPORT_TABLES)}"
+        )
+    if export_format not in FORMAT_WRITERS:
+        raise ExportError(
+            f"Unknown format '{export_format}', "
+            f"expected one of: {', '.join(FORMAT_WRITERS)}"
+        )
+    if export_format == "msgpack" and msgpack is None:
+        raise ExportError("The msgpack format requires the 'msgpack' package.")
+
+    model, fields = EXPORT_TABLES[table]
+    columns = [field.replace("__", "_") for field in fields]
+    queryset = model.objects.order_by("id")
+    if model is not Country:
+        queryset = queryset.filter(country__in=Country.objects.values("id"))
+    rows = queryset.values_list(*fields).iterator(chunk_size=2000)
+
+    return FORMAT_WRITERS[export_format](columns, rows)
@@ -0,0 +1,78 @@
+import gzip
+import time
+
+from django.core.management import BaseCommand, CommandError
+
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+
+from api.renderers import ORJSONRenderer
+from api.serializers import CountryReadSerializer
+from apps.countries.models import Country
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+
+class Command(BaseCommand):
+    help = "Benchmark CPU time and response size of the country list rendering"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=20)
+
+    def serialize_generic(self, countries):
+        """Serialize through DRF's per-field dispatch, as before the fast path."""
+
+        serializer = CountryReadSerializer()
+        return [
+            serializers.ModelSerializer.to_representation(serializer, country)
+            for country in countries
+        ]
+
+    def serialize_fast(self, countries):
+        return CountryReadSerializer(countries, many=True).data
+
+    def measure(self, serialize, renderer, countries, iterations):
+        start_time = time.process_time()
+        for _ in range(iterations):
+            content = renderer.render(serialize(countries))
+        return (time.process_time() - start_time) / iterations * 1000, content
+
+    def handle(self, *args, **options):
+        iterations = options["iterations"]
+        countries = list(
+            Country.objects.prefetch_related(*CountryReadSerializer.prefetch_lookups())
+        )
+        if not countries:
+            raise CommandError("No countries found, run fetch_countries_data first.")
+
+        self.stdout.write(
+            f"Rendering {len(countries)} countries, {iterations} iterations each "
+            "(database access excluded)."
+        )
+
+        baseline_ms, baseline_content = self.measure(
+            self.serialize_generic, JSONRenderer(), countries, iterations
+        )
+        fast_ms, fast_content = self.measure(
+            self.serialize_fast, ORJSONRenderer(), countries, iterations
+        )
+
+        self.stdout.write(f"DRF fields + JSONRenderer: {baseline_ms:8.2f} ms CPU")
+        self.stdout.write(f"Fast path + ORJSONRenderer: {fast_ms:8.2f} ms CPU")
+        self.stdout.write(
+            self.style.SUCCESS(f"Speedup: {baseline_ms / fast_ms:.1f}x per request")
+        )
+
+        self.stdout.write(f"Uncompressed (JSONRenderer): {len(baseline_content):>9} B")
+        self.stdout.write(f"Uncompressed (orjson):       {len(fast_content):>9} B")
+        self.stdout.write(
+            f"gzip:                        {len(gzip.compress(fast_content, 6)):>9} B"
+        )
+        if brotli is not None:
+            self.stdout.write(
+                "brotli:                      "
+                f"{len(brotli.compress(fast_content, quality=5)):>9} B"
+            )
@@ -0,0 +1,162 @@
+import io
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError, call_command
+from django.db import OperationalError, connections
+from django.test import Client, override_settings
+
+from apps.countries.models import Country
+from core.routers import use_primary
+
+
+class Command(BaseCommand):
+    help = (
+        "Run concurrent API reads while fetch_countries_data writes, and report "
+        "read throughput and 'database is locked' errors"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--file",
+            required=True,
+            help="REST countries JSON file the concurrent import loads.",
+        )
+        parser.add_argument("--readers", type=int, default=8)
+        parser.add_argument(
+            "--legacy",
+            action="store_true",
+            help="Emulate the previous profile: rollback journal, no read-only "
+            "connections and the default busy timeout.",
+        )
+
+    @contextmanager
+    def legacy_profile(self):
+        """Temporarily connect to the primary with the pre-WAL settings."""
+
+        options = connections.settings["default"]["OPTIONS"]
+        saved_options = dict(options)
+        options.clear()
+        options.update(
+            {
+                "init_command": "PRAGMA journal_mode=DELETE;PRAGMA synchronous=FULL;",
+                "timeout": 5,
+            }
+        )
+        connections.close_all()
+        try:
+            with use_primary():
+                Country.objects.exists()
+            yield
+        finally:
+            options.clear()
+            options.update(saved_options)
+            connections.close_all()
+            # Reconnecting runs the configured pragmas and restores WAL mode
+            with use_primary():
+                Country.objects.exists()
+            connections.close_all()
+
+    def read(self, uids, legacy, stop, stats, lock):
+        client = Client()
+        ok = locked = failed = 0
+        slowest = 0.0
+        index = 0
+
+        try:
+            while not stop.is_set():
+                # Query parameters bypass the mmap snapshot and the response
+                # cache is a dummy one, so every request reads the database
+                if index % 2:
+                    path = f"/api/countries/{uids[index % len(uids)]}?format=json"
+                else:
+                    path = "/api/countries?format=json"
+                index += 1
+
+                start_time = time.perf_counter()
+                try:
+                    if legacy:
+                        with use_primary():
+                            response = client.get(path)
+                    else:
+                        response = client.get(path)
+                except OperationalError as e:
+                    if "locked" in str(e):
+                        locked += 1
+                    else:
+                        failed += 1
+                    continue
+                slowest = max(slowest, time.perf_counter() - start_time)
+
+                # Uids of countries the import drops 404 once it activates
+                if response.status_code in (200, 404):
+                    ok += 1
+                else:
+                    failed += 1
+        finally:
+            connections.close_all()
+
+        with lock:
+            stats["ok"] += ok
+            stats["locked"] += locked
+            stats["failed"] += failed
+            stats["slowest"] = max(stats["slowest"], slowest)
+
+    def handle(self, *args, **options):
+        legacy = options["legacy"]
+        uids = list(Country.objects.values_list("uid", flat=True))
+        if not uids:
+            raise CommandError("No countries found, run fetch_countries_data first.")
+
+        stop = threading.Event()
+        lock = threading.Lock()
+        stats = {"ok": 0, "locked": 0, "failed": 0, "slowest": 0.0}
+        readers = [
+            threading.Thread(target=self.read, args=(uids, legacy, stop, stats, lock))
+            for _ in range(options["readers"])
+        ]
+
+        # The test client sends Host: testserver. Responses are not cached,
+        # so both profiles measure database reads rather than the cache.
+        benchmark_settings = override_settings(
+            ALLOWED_HOSTS=["testserver"],
+            CACHES={
+                **settings.CACHES,
+                "benchmark": {
+                    "BACKEND": "django.core.cache.backends.dummy.DummyCache"
+                },
+            },
+            COUNTRY_CACHE_ALIAS="benchmark",
+        )
+        with benchmark_settings, self.legacy_profile() if legacy else nullcontext():
+            start_time = time.perf_counter()
+            for reader in readers:
+                reader.start()
+            try:
+                call_command(
+                    "fetch_countries_data", file=options["file"], stdout=io.StringIO()
+                )
+            finally:
+                stop.set()
+                for reader in readers:
+                    reader.join()
+            elapsed_time = time.perf_counter() - start_time
+
+        profile = "legacy" if legacy else "WAL"
+        self.stdout.write(
+            f"Profile: {profile}, {options['readers']} readers, "
+            f"import took {elapsed_time:.2f} seconds."
+        )
+        self.stdout.write(f"Successful reads:         {stats['ok']}")
+        self.stdout.write(f"'database is locked':     {stats['locked']}")
+        self.stdout.write(f"Other failures:           {stats['failed']}")
+        self.stdout.write(
+            f"Slowest read:             {stats['slowest'] * 1000:.1f} ms"
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Read throughput:          {stats['ok'] / elapsed_time:.1f} requests/s"
+            )
+        )
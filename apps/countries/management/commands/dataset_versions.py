@@ -0,0 +1,50 @@
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count
+
+from core.routers import use_primary
+
+from apps.countries.models import DatasetVersion
+from apps.countries.signals import dataset_changed
+from apps.countries.versions import activate_version, current_version
+
+
+class Command(BaseCommand):
+    help = "List dataset versions, or roll readers back to one of them"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rollback",
+            type=int,
+            metavar="VERSION",
+            help="Serve this version to readers instead of the current one.",
+        )
+
+    def handle(self, *args, **options):
+        with use_primary():
+            if options["rollback"] is not None:
+                self.rollback(options["rollback"])
+            else:
+                self.list_versions()
+
+    def list_versions(self):
+        current = current_version()
+        versions = DatasetVersion.objects.annotate(change_count=Count("changes"))
+        for version in versions:
+            marker = "*" if current and version.pk == current.pk else " "
+            self.stdout.write(
+                f"{marker} {version.pk:>5}  {version.created_at:%Y-%m-%d %H:%M}  "
+                f"{version.country_count:>4} countries  "
+                f"{version.change_count:>4} changed"
+            )
+
+    def rollback(self, version_id):
+        version = DatasetVersion.objects.activated().filter(pk=version_id).first()
+        if version is None:
+            raise CommandError(f"Unknown dataset version {version_id}.")
+
+        # Only the pointer moves, the stored documents are served as they are
+        with transaction.atomic():
+            activate_version(version)
+            dataset_changed()
+        self.stdout.write(self.style.SUCCESS(f"Readers now see version {version.pk}."))
@@ -0,0 +1,55 @@
+import time
+from pathlib import Path
+
+from django.core.management import BaseCommand, CommandError
+
+from apps.countries.export import (
+    EXPORT_FORMATS,
+    EXPORT_TABLES,
+    ExportError,
+    stream_table,
+)
+
+
+class Command(BaseCommand):
+    help = "Export countries data as flat tables in CSV, NDJSON or msgpack"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--format", choices=list(EXPORT_FORMATS), default="csv", dest="format"
+        )
+        parser.add_argument(
+            "--table",
+            action="append",
+            choices=list(EXPORT_TABLES),
+            dest="tables",
+            help="Table to export, may be repeated. Defaults to every table.",
+        )
+        parser.add_argument("--output-dir", default=".", dest="output_dir")
+
+    def handle(self, *args, **options):
+        start_time = time.time()
+        export_format = options["format"]
+        output_dir = Path(options["output_dir"])
+        output_dir.mkdir(parents=True, exist_ok=True)
+        _, extension = EXPORT_FORMATS[export_format]
+
+        for table in options["tables"] or EXPORT_TABLES:
+            path = output_dir / f"{table}.{extension}"
+            try:
+                chunks = stream_table(table, export_format)
+            except ExportError as e:
+                raise CommandError(str(e))
+
+            with open(path, "wb") as f:
+                for chunk in chunks:
+                    f.write(chunk)
+
+            self.stdout.write(self.style.NOTICE(f"Exported {table} to {path}"))
+
+        elapsed_time = time.time() - start_time
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Successfully exported countries data in {elapsed_time:.2f} seconds."
+            )
+        )
@@ -1,12 +1,21 @@
+import json
 import logging
 import requests
 import time
+from datetime import timedelta
 
 from django.core.management import BaseCommand
 from django.db import transaction
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 
+from core.routers import use_primary
+
+from apps.countries.changes import prune_tombstones
 from apps.countries.models import (
     Country,
+    DatasetGeneration,
     Demonym,
     NativeName,
     Currency,
@@ -14,6 +23,13 @@ from apps.countries.models import (
     CountryLanguage,
     CountryTranslation,
 )
+from apps.countries.signals import dataset_changed
+from apps.countries.versions import (
+    activate_version,
+    changed_since,
+    record_version,
+    store_documents,
+)
 
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
@@ -22,15 +38,33 @@ logger = logging.getLogger(__name__)
 
 API_URL = "https://restcountries.com/v3.1/all"
 
+# A new generation smaller than this share of the active one is rejected as a
+# truncated upstream response
+MIN_GENERATION_RATIO = 0.9
+
+# Generations still loading after this long are assumed to be abandoned
+STALE_LOADING_AGE = timedelta(hours=6)
+
+BATCH_SIZE = 500
+
 
 class Command(BaseCommand):
     help = "Import countries data from REST countries API"
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--file",
+            dest="file",
+            help="Import from a JSON file in the REST countries format instead.",
+        )
+
     def handle(self, *args, **kwargs):
         start_time = time.time()
+        self.source_file = kwargs.get("file")
         self.stdout.write(self.style.SUCCESS("Starting countries import..."))
 
-        success = self.load_countries_data()
+        with use_primary():
+            success = self.load_countries_data()
 
         if success:
             elapsed_time = time.time() - start_time
@@ -45,6 +79,13 @@ class Command(BaseCommand):
     def fetch_countries_data(self):
         """Fetch countries data from the REST countries API."""
 
+        if self.source_file:
+            self.stdout.write(
+                self.style.NOTICE(f"Reading countries data from {self.source_file}")
+            )
+            with open(self.source_file, encoding="utf-8") as f:
+                return json.load(f)
+
         try:
             self.stdout.write(
                 self.style.NOTICE(f"Fetching countries data from {API_URL}")
@@ -57,80 +98,306 @@ class Command(BaseCommand):
             return None
 
     def process_native_names(self, country_obj, native_names_data):
-        """Process and save native name data for a country."""
+        """Build native name rows for a country."""
 
         if not native_names_data:
-            return
+            return []
 
-        for lang_code, names in native_names_data.items():
-            NativeName.objects.create(
+        return [
+            NativeName(
                 country=country_obj,
                 language_code=lang_code,
                 official_name=names.get("official", ""),
                 common_name=names.get("common", ""),
             )
+            for lang_code, names in native_names_data.items()
+        ]
 
     def process_currencies(self, country_obj, currencies_data):
-        """Process and save currency data for a country."""
+        """Build currency rows for a country."""
 
         if not currencies_data:
-            return
+            return []
 
-        for currency_code, currency_info in currencies_data.items():
-            Currency.objects.create(
+        return [
+            Currency(
                 country=country_obj,
                 code=currency_code,
                 name=currency_info.get("name", ""),
                 symbol=currency_info.get("symbol", ""),
             )
+            for currency_code, currency_info in currencies_data.items()
+        ]
 
     def process_languages(self, country_obj, languages_data):
-        """Process and save language data for a country."""
+        """Build country-language rows, creating languages not seen before."""
 
         if not languages_data:
-            return
+            return []
 
+        country_languages = []
         for code, name in languages_data.items():
-            # Create or get the language object
-            language, _ = Language.objects.get_or_create(
-                code=code, defaults={"name": name}
-            )
+            language = self.languages.get(code)
+            if language is None:
+                language = self.languages[code] = Language.objects.create(
+                    code=code, name=name
+                )
 
-            # Create the country-language relationship
-            CountryLanguage.objects.create(country=country_obj, language=language)
+            country_languages.append(
+                CountryLanguage(country=country_obj, language=language)
+            )
+        return country_languages
 
     def process_demonyms(self, country_obj, demonyms_data):
-        """Process and save demonym data for a country."""
+        """Build demonym rows for a country."""
 
         if not demonyms_data:
-            return
-
-        for lang_code, gender_data in demonyms_data.items():
-            for gender, name in gender_data.items():
-                Demonym.objects.create(
-                    country=country_obj,
-                    language_code=lang_code,
-                    gender=gender,
-                    name=name,
-                )
+            return []
+
+        return [
+            Demonym(
+                country=country_obj,
+                language_code=lang_code,
+                gender=gender,
+                name=name,
+            )
+            for lang_code, gender_data in demonyms_data.items()
+            for gender, name in gender_data.items()
+        ]
 
     def process_translations(self, country_obj, translations_data):
-        """Process and save translations data for a country."""
+        """Build translation rows for a country."""
 
         if not translations_data:
-            return
+            return []
 
-        for lang_code, translation in translations_data.items():
-            CountryTranslation.objects.create(
+        return [
+            CountryTranslation(
                 country=country_obj,
                 language_code=lang_code,
                 official_name=translation.get("official", ""),
                 common_name=translation.get("common", ""),
             )
+            for lang_code, translation in translations_data.items()
+        ]
+
+    def process_country(self, generation, country_data):
+        """Build a country row for the given generation."""
+
+        name = country_data.get("name", {})
+        idd = country_data.get("idd", {})
+        capitals = country_data.get("capital", [])
+        capital = capitals[0] if capitals else None
+        latlng = country_data.get("latlng", [])
+        capital_info = country_data.get("capitalInfo", {})
+        capital_latlng = country_data.get("latlng", []) if capital_info else None
+        postal_code = country_data.get("postalCode", {})
+
+        country = Country(
+            generation=generation,
+            name_common=name.get("common", ""),
+            name_official=name.get("official", ""),
+            tld=country_data.get("tld", []),
+            cca2=country_data.get("cca2", ""),
+            ccn3=country_data.get("ccn3", ""),
+            cioc=country_data.get("cioc", ""),
+            independent=country_data.get("independent", False),
+            status=country_data.get("status", ""),
+            un_member=country_data.get("unMember", False),
+            idd_root=idd.get("root", ""),
+            idd_suffixes=idd.get("suffixes", []),
+            capital=capital,
+            alt_spellings=country_data.get("altSpellings", []),
+            region=country_data.get("region", ""),
+            subregion=country_data.get("subregion", ""),
+            latitude=latlng[0] if latlng else None,
+            longitude=latlng[1] if latlng else None,
+            landlocked=country_data.get("landlocked", False),
+            borders=country_data.get("borders", []),
+            area=country_data.get("area", 0),
+            cca3=country_data.get("cca3", ""),
+            flag=country_data.get("flag", ""),
+            google_maps=country_data.get("maps", {}).get("googleMaps", ""),
+            openstreetmaps=country_data.get("maps", {}).get("openStreetMaps", ""),
+            population=country_data.get("population", 0),
+            gini=country_data.get("gini", {}),
+            fifa=country_data.get("fifa", ""),
+            car_signs=country_data.get("car", {}).get("signs", []),
+            car_side=country_data.get("car", {}).get("side", ""),
+            timezones=country_data.get("timezones", []),
+            continents=country_data.get("continents", []),
+            flag_png=country_data.get("flags", {}).get("png", ""),
+            flag_svg=country_data.get("flags", {}).get("svg", ""),
+            flag_alt=country_data.get("flags", {}).get("alt", ""),
+            coat_of_arms_png=country_data.get("coatOfArms", {}).get("png", ""),
+            coat_of_arms_svg=country_data.get("coatOfArms", {}).get("svg", ""),
+            start_of_week=country_data.get("startOfWeek", ""),
+            capital_latlng=capital_latlng,
+            postal_code_format=postal_code.get("format", ""),
+            postal_code_regex=postal_code.get("regex", ""),
+        )
+        # Keep the uid a country had in the previous generation so clients and
+        # dataset versions can follow it across imports
+        if country.cca3 in self.previous_uids:
+            country.uid = self.previous_uids[country.cca3]
+        return country
+
+    def load_generation(self, generation, countries_data):
+        """Insert every country of the new generation and its child rows."""
+
+        self.languages = {
+            language.code: language for language in Language.objects.all()
+        }
+        self.previous_uids = dict(
+            Country.objects.exclude(cca3="").values_list("cca3", "uid")
+        )
+        countries = []
+        children = {
+            NativeName: [],
+            Currency: [],
+            CountryLanguage: [],
+            CountryTranslation: [],
+            Demonym: [],
+        }
+
+        with transaction.atomic():
+            for country_data in countries_data:
+                try:
+                    country = self.process_country(generation, country_data)
+                    name = country_data.get("name", {})
+                    rows = {
+                        NativeName: self.process_native_names(
+                            country, name.get("nativeName", {})
+                        ),
+                        Currency: self.process_currencies(
+                            country, country_data.get("currencies", {})
+                        ),
+                        CountryLanguage: self.process_languages(
+                            country, country_data.get("languages", {})
+                        ),
+                        CountryTranslation: self.process_translations(
+                            country, country_data.get("translations", {})
+                        ),
+                        Demonym: self.process_demonyms(
+                            country, country_data.get("demonyms", {})
+                        ),
+                    }
+                except Exception as e:
+                    name = country_data.get("name", {})
+                    self.stdout.write(
+                        self.style.ERROR(f"Error processing country {name}: {e}")
+                    )
+                    continue
+
+                countries.append(country)
+                for model, objs in rows.items():
+                    children[model].extend(objs)
+
+            # Bulk inserts skip the per-row signals, the generation is not
+            # visible to readers until it is activated anyway
+            Country.all_generations.bulk_create(countries, batch_size=BATCH_SIZE)
+            for model, objs in children.items():
+                model.objects.bulk_create(objs, batch_size=BATCH_SIZE)
+
+            generation.country_count = len(countries)
+            generation.save(update_fields=["country_count"])
+
+    def validate_generation(self, generation, active):
+        """Return a reason to reject the loaded generation, or None."""
+
+        if not generation.country_count:
+            return "no countries were loaded"
+
+        if active is not None:
+            minimum = int(active.country_count * MIN_GENERATION_RATIO)
+            if generation.country_count < minimum:
+                return (
+                    f"only {generation.country_count} countries were loaded, "
+                    f"expected at least {minimum}"
+                )
+
+        codes = Country.all_generations.filter(
+            generation=generation, cca3__isnull=False
+        ).exclude(cca3="")
+        if codes.values("cca3").distinct().count() != codes.count():
+            return "duplicate cca3 codes"
+
+        return None
+
+    def activate_generation(self, generation, active, documents):
+        """
+        Record the new generation as a dataset version and switch readers to
+        both in one transaction. Returns the version and the changed uids.
+        """
+
+        rows = Country.all_generations.filter(generation=generation)
+        with transaction.atomic():
+            # Taken once the write lock is held, so no transaction committing
+            # before this one carries a later timestamp
+            now = timezone.now()
+            version = record_version(generation, documents)
+            # Only countries whose document differs from the generation being
+            # replaced count as changed for incremental sync clients, which
+            # follow the tables; the others keep their timestamp
+            changed = changed_since(active, documents)
+            rows.filter(uid__in=changed).update(updated_at=now)
+            rows.exclude(uid__in=changed).update(
+                updated_at=Coalesce(
+                    Subquery(
+                        Country.all_generations.filter(
+                            generation=active, uid=OuterRef("uid")
+                        ).values("updated_at")[:1]
+                    ),
+                    Value(now),
+                )
+            )
+            DatasetGeneration.objects.filter(pk=generation.pk).update(
+                status=DatasetGeneration.ACTIVE, activated_at=now
+            )
+            if active is not None:
+                DatasetGeneration.objects.filter(pk=active.pk).update(
+                    status=DatasetGeneration.RETIRED
+                )
+            activate_version(version)
+            # Bulk updates send no signals; publish when the switch commits
+            # rather than after garbage collection
+            dataset_changed()
+
+        return version, changed
+
+    def collect_garbage(self):
+        """
+        Delete every generation but the active one and those still loading,
+        along with countries imported before generations existed.
+        """
+
+        activated = DatasetGeneration.objects.activated()
+        with transaction.atomic():
+            stale = DatasetGeneration.objects.exclude(
+                pk__in=activated.values("pk")[:1]
+            ).exclude(
+                status=DatasetGeneration.LOADING,
+                created_at__gte=timezone.now() - STALE_LOADING_AGE,
+            )
+            deleted, _ = stale.delete()
+
+            if activated.exists():
+                legacy, _ = Country.all_generations.filter(
+                    generation__isnull=True
+                ).delete()
+                deleted += legacy
+
+            Language.objects.filter(countries__isnull=True).delete()
+            dataset_changed()
+        return deleted
 
-    @transaction.atomic
     def load_countries_data(self):
-        """Main function to load countries data into the database."""
+        """
+        Load the countries data as a new generation, then activate it.
+
+        Readers keep seeing the active generation until the new one is fully
+        loaded and validated, and the upstream request holds no transaction.
+        """
 
         # Fetch data from API
         countries_data = self.fetch_countries_data()
@@ -142,103 +409,40 @@ class Command(BaseCommand):
             f"Successfully fetched {len(countries_data)} countries data from API."
         )
 
-        # Clear existing data
-        self.stdout.write(self.style.NOTICE("Clearing existing data..."))
-
-        Currency.objects.all().delete()
-        CountryLanguage.objects.all().delete()
-        CountryTranslation.objects.all().delete()
-        NativeName.objects.all().delete()
-        Demonym.objects.all().delete()
-        Country.objects.all().delete()
-        Language.objects.all().delete()
-
-        # Process countries data
-        for country_data in countries_data:
-            try:
-                name = country_data.get("name", {})
-                idd = country_data.get("idd", {})
-                capitals = country_data.get("capital", [])
-                capital = capitals[0] if capitals else None
-                latlng = country_data.get("latlng", [])
-                capital_info = country_data.get("capitalInfo", {})
-                capital_latlng = (
-                    country_data.get("latlng", []) if capital_info else None
-                )
-                postal_code = country_data.get("postalCode", {})
-
-                country = Country.objects.create(
-                    name_common=name.get("common", ""),
-                    name_official=name.get("official", ""),
-                    tld=country_data.get("tld", []),
-                    cca2=country_data.get("cca2", ""),
-                    ccn3=country_data.get("ccn3", ""),
-                    cioc=country_data.get("cioc", ""),
-                    independent=country_data.get("independent", False),
-                    status=country_data.get("status", ""),
-                    un_member=country_data.get("unMember", False),
-                    idd_root=idd.get("root", ""),
-                    idd_suffixes=idd.get("suffixes", []),
-                    capital=capital,
-                    alt_spellings=country_data.get("altSpellings", []),
-                    region=country_data.get("region", ""),
-                    subregion=country_data.get("subregion", ""),
-                    latitude=latlng[0] if latlng else None,
-                    longitude=latlng[1] if latlng else None,
-                    landlocked=country_data.get("landlocked", False),
-                    borders=country_data.get("borders", []),
-                    area=country_data.get("area", 0),
-                    cca3=country_data.get("cca3", ""),
-                    flag=country_data.get("flag", ""),
-                    google_maps=country_data.get("maps", {}).get("googleMaps", ""),
-                    openstreetmaps=country_data.get("maps", {}).get(
-                        "openStreetMaps", ""
-                    ),
-                    population=country_data.get("population", 0),
-                    gini=country_data.get("gini", {}),
-                    fifa=country_data.get("fifa", ""),
-                    car_signs=country_data.get("car", {}).get("signs", []),
-                    car_side=country_data.get("car", {}).get("side", ""),
-                    timezones=country_data.get("timezones", []),
-                    continents=country_data.get("continents", []),
-                    flag_png=country_data.get("flags", {}).get("png", ""),
-                    flag_svg=country_data.get("flags", {}).get("svg", ""),
-                    flag_alt=country_data.get("flags", {}).get("alt", ""),
-                    coat_of_arms_png=country_data.get("coatOfArms", {}).get("png", ""),
-                    coat_of_arms_svg=country_data.get("coatOfArms", {}).get("svg", ""),
-                    start_of_week=country_data.get("startOfWeek", ""),
-                    capital_latlng=capital_latlng,
-                    postal_code_format=postal_code.get("format", ""),
-                    postal_code_regex=postal_code.get("regex", ""),
-                )
-
-                # Process native names
-                native_names = name.get("nativeName", {})
-                self.process_native_names(country, native_names)
-
-                # Process currencies
-                self.process_currencies(country, country_data.get("currencies", {}))
-
-                # Process languages
-                self.process_languages(country, country_data.get("languages", {}))
-
-                # Process translations
-                self.process_translations(country, country_data.get("translations", {}))
-
-                # Process demonyms
-                self.process_demonyms(country, country_data.get("demonyms", {}))
+        active = DatasetGeneration.objects.activated().first()
+        generation = DatasetGeneration.objects.create()
+        self.stdout.write(self.style.NOTICE(f"Loading {generation}..."))
 
-            except Exception as e:
-                self.stdout.write(
-                    self.style.ERROR(
-                        f"Error processing country {country_data.get('name', {})}: {e}"
-                    )
-                )
+        try:
+            self.load_generation(generation, countries_data)
+            error = self.validate_generation(generation, active)
+        except Exception:
+            generation.delete()
+            raise
+
+        if error:
+            generation.status = DatasetGeneration.FAILED
+            generation.save(update_fields=["status"])
+            self.stdout.write(self.style.ERROR(f"Rejected {generation}: {error}."))
+            self.collect_garbage()
+            return False
 
+        documents = store_documents(generation)
+        version, changed = self.activate_generation(generation, active, documents)
         self.stdout.write(
             self.style.SUCCESS(
-                f"Data import completed. Imported {Country.objects.count()} countries."
+                f"Data import completed. Activated generation {generation.pk} "
+                f"with {generation.country_count} countries as version "
+                f"{version.pk}, {len(changed)} changed."
             )
         )
 
+        deleted = self.collect_garbage()
+        if deleted:
+            self.stdout.write(f"Removed {deleted} rows of old generations.")
+
+        pruned = prune_tombstones()
+        if pruned:
+            self.stdout.write(f"Pruned {pruned} expired tombstones.")
+
         return True
@@ -0,0 +1,30 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the primary SQLite database into every DATABASE_REPLICAS file, "
+        "so the replicas have its tables and data"
+    )
+
+    def handle(self, *args, **options):
+        if not settings.REPLICA_FILES:
+            raise CommandError("No replica files configured in DATABASE_REPLICAS.")
+
+        primary = sqlite3.connect(settings.DATABASES["default"]["NAME"])
+        try:
+            for alias, path in settings.REPLICA_FILES.items():
+                # The backup API copies a consistent state of the primary even
+                # while it is being written, and readers of the replica see
+                # either the old or the new copy
+                replica = sqlite3.connect(path)
+                try:
+                    primary.backup(replica)
+                finally:
+                    replica.close()
+                self.stdout.write(self.style.SUCCESS(f"Seeded {alias} at {path}"))
+        finally:
+            primary.close()
@@ -1,6 +1,7 @@
 import uuid
 
 from django.db import models
+from django.db.models import Exists, Q, Subquery
 
 
 class BaseModelWithUID(models.Model):
@@ -15,7 +16,74 @@ class BaseModelWithUID(models.Model):
         ordering = ["-created_at"]
 
 
+class ActivationQuerySet(models.QuerySet):
+    def activated(self):
+        return self.filter(activated_at__isnull=False).order_by("-activated_at")
+
+
+class DatasetGeneration(models.Model):
+    """
+    One complete import of the countries dataset.
+
+    Imports load a new generation next to the active one; readers only see
+    the most recently activated generation, so switching to a new dataset is
+    a single update of ``activated_at``.
+    """
+
+    LOADING = "loading"
+    ACTIVE = "active"
+    RETIRED = "retired"
+    FAILED = "failed"
+    STATUS_CHOICES = (
+        (LOADING, "Loading"),
+        (ACTIVE, "Active"),
+        (RETIRED, "Retired"),
+        (FAILED, "Failed"),
+    )
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=LOADING)
+    country_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    activated_at = models.DateTimeField(blank=True, null=True, db_index=True)
+
+    objects = ActivationQuerySet.as_manager()
+
+    def __str__(self):
+        return f"Generation {self.pk} ({self.get_status_display()})"
+
+    class Meta:
+        ordering = ["-created_at"]
+
+
+class CountryManager(models.Manager):
+    """Only returns the countries of the active dataset generation."""
+
+    def get_queryset(self):
+        # A subquery rather than a looked-up id, so querysets built once at
+        # import time still follow the active generation when it changes.
+        # Countries without a generation are visible until one is activated.
+        activated = DatasetGeneration.objects.activated()
+        return (
+            super()
+            .get_queryset()
+            .filter(
+                Q(generation=Subquery(activated.values("id")[:1]))
+                | Q(generation__isnull=True) & ~Exists(activated)
+            )
+        )
+
+
 class Country(BaseModelWithUID):
+    # A country keeps its uid across generations, so the uid is only unique
+    # within one generation
+    uid = models.UUIDField(db_index=True, default=uuid.uuid4, editable=False)
+    generation = models.ForeignKey(
+        DatasetGeneration,
+        on_delete=models.CASCADE,
+        related_name="countries",
+        blank=True,
+        null=True,
+    )
     name_common = models.CharField(max_length=100)
     name_official = models.CharField(max_length=255)
     tld = models.JSONField(default=list, blank=True, null=True)
@@ -60,9 +128,108 @@ class Country(BaseModelWithUID):
     postal_code_format = models.CharField(max_length=100, blank=True, null=True)
     postal_code_regex = models.CharField(max_length=255, blank=True, null=True)
 
+    objects = CountryManager()
+    all_generations = models.Manager()
+
     def __str__(self):
         return self.name_common
 
+    class Meta(BaseModelWithUID.Meta):
+        # Rows of a generation are bulk created within the same instant, so
+        # list by a key that stored dataset versions can reproduce too
+        ordering = ["name_common", "uid"]
+        indexes = [models.Index(fields=["updated_at"])]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["generation", "uid"], name="unique_country_uid_per_generation"
+            )
+        ]
+
+
+class CountryDocument(models.Model):
+    """A rendered country document, stored once per distinct content."""
+
+    digest = models.CharField(max_length=64, unique=True)
+    body = models.JSONField()
+
+    def __str__(self):
+        return self.digest
+
+
+class DatasetVersion(models.Model):
+    """
+    A recorded state of the dataset.
+
+    A version only stores the country documents that changed since its
+    parent. Every few versions a checkpoint also stores its full map of uid
+    to document id, and the dataset of any other version is rebuilt from its
+    nearest checkpoint by replaying the changes since. The most recently
+    activated version is the current one, so rolling back is a single update
+    of ``activated_at``.
+    """
+
+    parent = models.ForeignKey(
+        "self",
+        on_delete=models.PROTECT,
+        related_name="children",
+        blank=True,
+        null=True,
+    )
+    generation = models.ForeignKey(
+        DatasetGeneration,
+        on_delete=models.SET_NULL,
+        related_name="versions",
+        blank=True,
+        null=True,
+    )
+    country_count = models.PositiveIntegerField(default=0)
+    # Versions since the nearest checkpoint, 0 for a checkpoint
+    depth = models.PositiveIntegerField(default=0)
+    # Only set on checkpoints
+    manifest = models.JSONField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    activated_at = models.DateTimeField(blank=True, null=True, db_index=True)
+
+    objects = ActivationQuerySet.as_manager()
+
+    def __str__(self):
+        return f"Version {self.pk}"
+
+    class Meta:
+        ordering = ["-created_at"]
+
+
+class DatasetVersionChange(models.Model):
+    version = models.ForeignKey(
+        DatasetVersion, on_delete=models.CASCADE, related_name="changes"
+    )
+    # The country uid
+    key = models.CharField(max_length=36)
+    # No document marks a country removed in this version
+    document = models.ForeignKey(
+        CountryDocument, on_delete=models.PROTECT, blank=True, null=True
+    )
+
+    def __str__(self):
+        return f"{self.version} - {self.key}"
+
+    class Meta:
+        unique_together = ("version", "key")
+
+
+class CountryTombstone(models.Model):
+    """Records a deleted country so incremental sync clients can drop it."""
+
+    uid = models.UUIDField(unique=True)
+    cca3 = models.CharField(max_length=3, blank=True, null=True)
+    deleted_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.uid} (deleted {self.deleted_at:%Y-%m-%d %H:%M})"
+
+    class Meta:
+        ordering = ["deleted_at"]
+
 
 class Demonym(BaseModelWithUID):
     GENDER_CHOICES = (
@@ -0,0 +1,103 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .cache import invalidate
+from .models import (
+    Country,
+    CountryTombstone,
+    Demonym,
+    NativeName,
+    Currency,
+    CountryLanguage,
+    CountryTranslation,
+)
+from .snapshot import rebuild_snapshot
+
+CHILD_MODELS = [Demonym, NativeName, Currency, CountryLanguage, CountryTranslation]
+
+_parent_touches_suspended = ContextVar("parent_touches_suspended", default=False)
+
+
+def publish_dataset():
+    """Publish the committed dataset to the snapshot and response cache."""
+
+    rebuild_snapshot()
+    invalidate()
+
+
+def dataset_changed():
+    """Publish the dataset once the current transaction commits."""
+
+    # A transaction touching many rows only needs to publish once
+    connection = transaction.get_connection()
+    if any(entry[1] is publish_dataset for entry in connection.run_on_commit):
+        return
+    transaction.on_commit(publish_dataset)
+
+
+def touch_countries(country_ids):
+    """Bump ``updated_at`` on the given countries after their children changed."""
+
+    Country.objects.filter(id__in=country_ids).update(updated_at=timezone.now())
+    dataset_changed()
+
+
+@receiver(post_save, sender=Country)
+def country_saved(sender, instance, created, **kwargs):
+    if created:
+        CountryTombstone.objects.filter(uid=instance.uid).delete()
+    dataset_changed()
+
+
+@receiver(post_delete, sender=Country)
+def country_deleted(sender, instance, **kwargs):
+    # Rows of a retired generation go away while the country lives on under
+    # the same uid in the active one
+    if not Country.objects.filter(uid=instance.uid).exists():
+        CountryTombstone.objects.update_or_create(
+            uid=instance.uid,
+            defaults={"cca3": instance.cca3, "deleted_at": timezone.now()},
+        )
+    dataset_changed()
+
+
+@contextmanager
+def suspend_parent_touches():
+    """
+    Skip bumping the parent country for each child row saved or deleted in
+    the block; the caller touches the countries once instead.
+    """
+
+    token = _parent_touches_suspended.set(True)
+    try:
+        yield
+    finally:
+        _parent_touches_suspended.reset(token)
+
+
+def touch_parent_country(sender, instance, origin=None, **kwargs):
+    if _parent_touches_suspended.get():
+        return
+    # Children removed by a cascade from their country or generation have no
+    # parent left to bump
+    if origin is not None and getattr(origin, "model", type(origin)) is not sender:
+        return
+    touch_countries([instance.country_id])
+
+
+for child_model in CHILD_MODELS:
+    post_save.connect(
+        touch_parent_country,
+        sender=child_model,
+        dispatch_uid=f"touch_country_{child_model.__name__}_save",
+    )
+    post_delete.connect(
+        touch_parent_country,
+        sender=child_model,
+        dispatch_uid=f"touch_country_{child_model.__name__}_delete",
+    )
@@ -0,0 +1,230 @@
+"""
+Country similarity over a precomputed feature matrix.
+
+Each feature group yields an N x N similarity matrix in [0, 1]; the groups
+are stacked into one array so any weighting is a single weighted sum over
+its first axis.
+"""
+
+import threading
+
+from .codes import dataset_fingerprint
+from .models import Country, CountryLanguage, Currency
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+FEATURES = [
+    "languages",
+    "currencies",
+    "region",
+    "subregion",
+    "continents",
+    "borders",
+    "population",
+    "area",
+    "coordinates",
+]
+DEFAULT_WEIGHTS = {feature: 1.0 for feature in FEATURES}
+
+# Neighbours precomputed per country for the default weights
+TOP_K = 20
+
+_lock = threading.Lock()
+_index = None
+_index_key = None
+
+
+class SimilarityUnavailable(Exception):
+    pass
+
+
+def _column(countries, field_name):
+    return np.array(
+        [np.nan if c[field_name] is None else c[field_name] for c in countries],
+        dtype=np.float64,
+    )
+
+
+def _multi_hot(rows):
+    vocabulary = {value: i for i, value in enumerate(sorted(set().union(*rows)))}
+    matrix = np.zeros((len(rows), len(vocabulary)), dtype=np.float32)
+    for i, values in enumerate(rows):
+        matrix[i, [vocabulary[value] for value in values]] = 1
+    return matrix
+
+
+def _jaccard(matrix):
+    shared = matrix @ matrix.T
+    sizes = matrix.sum(axis=1)
+    union = sizes[:, None] + sizes[None, :] - shared
+    return np.divide(shared, union, out=np.zeros_like(shared), where=union > 0)
+
+
+def _equality(values):
+    one_hot = _multi_hot([{value} if value else set() for value in values])
+    return one_hot @ one_hot.T
+
+
+def _closeness(values):
+    """1 for equal values down to 0 for the two ends of the observed range."""
+
+    values = np.asarray(values, dtype=np.float64)
+    known = values[~np.isnan(values)]
+    spread = known.max() - known.min() if known.size else 0
+    if not spread:
+        return np.zeros((len(values), len(values)), dtype=np.float32)
+    similarity = 1 - np.abs(values[:, None] - values[None, :]) / spread
+    return np.nan_to_num(similarity, nan=0.0).astype(np.float32)
+
+
+def _geographic_closeness(latitudes, longitudes):
+    """1 for the same point down to 0 for antipodes, by great-circle distance."""
+
+    lat = np.radians(np.asarray(latitudes, dtype=np.float64))
+    lng = np.radians(np.asarray(longitudes, dtype=np.float64))
+    a = (
+        np.sin((lat[:, None] - lat[None, :]) / 2) ** 2
+        + np.cos(lat[:, None])
+        * np.cos(lat[None, :])
+        * np.sin((lng[:, None] - lng[None, :]) / 2) ** 2
+    )
+    distance = 2 * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+    return np.nan_to_num(1 - distance / np.pi, nan=0.0).astype(np.float32)
+
+
+class SimilarityIndex:
+    def __init__(self, countries, matrices):
+        self.countries = countries
+        self.positions = {country["uid"]: i for i, country in enumerate(countries)}
+        # Shape (features, N, N)
+        self.matrices = matrices
+        self.neighbours, self.scores = self._rank_all(
+            self.weight_vector(DEFAULT_WEIGHTS)
+        )
+
+    @staticmethod
+    def weight_vector(weights):
+        vector = np.array([weights.get(f, 0.0) for f in FEATURES], dtype=np.float32)
+        if vector.sum() <= 0:
+            raise ValueError("At least one feature weight must be positive.")
+        return vector / vector.sum()
+
+    def _rank_all(self, weights):
+        scores = np.tensordot(weights, self.matrices, axes=1)
+        np.fill_diagonal(scores, -np.inf)
+        k = min(TOP_K, len(self.countries) - 1)
+        if k <= 0:
+            return np.empty((len(self.countries), 0), dtype=np.intp), scores
+
+        candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+        order = np.argsort(-candidate_scores, axis=1, kind="stable")
+        return np.take_along_axis(candidates, order, axis=1), scores
+
+    def similar(self, uid, weights=None, limit=10):
+        """
+        Return ``(country, score)`` pairs most similar to the country with this
+        uid, or None for an unknown uid.
+        """
+
+        position = self.positions.get(uid)
+        if position is None:
+            return None
+
+        if weights is None and limit <= TOP_K:
+            ranked = self.neighbours[position][:limit]
+            row = self.scores[position]
+        else:
+            vector = self.weight_vector(weights or DEFAULT_WEIGHTS)
+            row = vector @ self.matrices[:, position, :]
+            row[position] = -np.inf
+            k = min(limit, len(self.countries) - 1)
+            if k <= 0:
+                return []
+            candidates = np.argpartition(-row, k - 1)[:k]
+            ranked = candidates[np.argsort(-row[candidates], kind="stable")]
+
+        return [(self.countries[i], float(row[i])) for i in ranked]
+
+
+def build_index():
+    """Load the feature columns of every country and stack their similarities."""
+
+    active = Country.objects.values("id")
+    countries = list(
+        Country.objects.order_by("id").values(
+            "id",
+            "uid",
+            "name_common",
+            "cca3",
+            "region",
+            "subregion",
+            "continents",
+            "borders",
+            "population",
+            "area",
+            "latitude",
+            "longitude",
+        )
+    )
+    positions = {country["id"]: i for i, country in enumerate(countries)}
+
+    languages = [set() for _ in countries]
+    for country_id, code in CountryLanguage.objects.filter(
+        country__in=active
+    ).values_list("country_id", "language__code"):
+        languages[positions[country_id]].add(code)
+
+    currencies = [set() for _ in countries]
+    for country_id, code in Currency.objects.filter(country__in=active).values_list(
+        "country_id", "code"
+    ):
+        currencies[positions[country_id]].add(code)
+
+    by_cca3 = {country["cca3"]: i for i, country in enumerate(countries)}
+    borders = np.zeros((len(countries), len(countries)), dtype=np.float32)
+    for i, country in enumerate(countries):
+        for code in country["borders"] or []:
+            if code in by_cca3:
+                borders[i, by_cca3[code]] = borders[by_cca3[code], i] = 1
+
+    matrices = np.stack(
+        [
+            _jaccard(_multi_hot(languages)),
+            _jaccard(_multi_hot(currencies)),
+            _equality([country["region"] for country in countries]),
+            _equality([country["subregion"] for country in countries]),
+            _jaccard(_multi_hot([set(c["continents"] or []) for c in countries])),
+            borders,
+            _closeness(np.log10(1 + _column(countries, "population"))),
+            _closeness(np.log10(1 + _column(countries, "area"))),
+            _geographic_closeness(
+                _column(countries, "latitude"), _column(countries, "longitude")
+            ),
+        ]
+    ).astype(np.float32)
+
+    for country in countries:
+        country["uid"] = str(country["uid"])
+
+    return SimilarityIndex(countries, matrices)
+
+
+def get_index():
+    """Return the similarity index, rebuilding it when the dataset changed."""
+
+    global _index, _index_key
+
+    if np is None:
+        raise SimilarityUnavailable("Country similarity requires the 'numpy' package.")
+
+    key = dataset_fingerprint()
+    if _index is None or _index_key != key:
+        with _lock:
+            if _index is None or _index_key != key:
+                _index = build_index()
+                _index_key = key
+    return _index
@@ -0,0 +1,222 @@
+"""
+Read-only snapshot of the rendered country dataset, shared between worker
+processes through ``mmap``.
+
+Layout (little-endian)::
+
+    header   magic, format version, dataset version, country count
+    index    one (uid bytes, row) pair per country, sorted by uid
+    offsets  count + 1 offsets of each document in the blob
+    blob     the JSON list of every document, in list endpoint order
+
+The blob is a complete JSON array, so the list endpoint serves it as is and
+the detail endpoint serves the slice between two offsets.
+"""
+
+import bisect
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from core.routers import use_primary
+
+from .models import Country
+from .versions import documents_as_of, list_order, rolled_back_version
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+MAGIC = b"CTRYSNAP"
+FORMAT_VERSION = 1
+
+HEADER = struct.Struct("<8sIQI")
+INDEX_ENTRY = struct.Struct("<16sI")
+OFFSET = struct.Struct("<Q")
+
+
+class SnapshotError(Exception):
+    pass
+
+
+_write_lock = threading.Lock()
+
+
+@contextmanager
+def write_lock(directory):
+    """
+    Serialize snapshot writes across threads and processes. Every write
+    renders after its own commit, so the last one to replace the file always
+    holds the newest data.
+    """
+
+    with _write_lock:
+        if fcntl is None:
+            yield
+            return
+
+        with open(os.path.join(directory, ".snapshot-lock"), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def write_snapshot(path=None):
+    """Render every country and atomically replace the snapshot file."""
+
+    path = path or settings.COUNTRY_SNAPSHOT_PATH
+    directory = os.path.dirname(os.path.abspath(path))
+    with write_lock(directory):
+        return _write_snapshot(path, directory)
+
+
+def _write_snapshot(path, directory):
+    from api.renderers import ORJSONRenderer
+    from api.serializers import CountryReadSerializer
+
+    with use_primary():
+        # Readers rolled back to an older version get its stored documents
+        version = rolled_back_version()
+        if version is not None:
+            data = sorted(documents_as_of(version).values(), key=list_order)
+        else:
+            countries = Country.objects.prefetch_related(
+                *CountryReadSerializer.prefetch_lookups()
+            )
+            data = CountryReadSerializer(countries, many=True).data
+    renderer = ORJSONRenderer()
+    documents = [renderer.render(document) for document in data]
+
+    offsets = []
+    position = 1
+    for document in documents:
+        offsets.append(position)
+        position += len(document) + 1
+    offsets.append(position)
+
+    index = sorted(
+        (uuid.UUID(document["uid"]).bytes, row) for row, document in enumerate(data)
+    )
+    dataset_version = time.time_ns() // 1000
+
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".snapshot-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(
+                HEADER.pack(MAGIC, FORMAT_VERSION, dataset_version, len(documents))
+            )
+            for entry in index:
+                f.write(INDEX_ENTRY.pack(*entry))
+            for offset in offsets:
+                f.write(OFFSET.pack(offset))
+            f.write(b"[" + b",".join(documents) + b"]")
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+    return dataset_version
+
+
+def rebuild_snapshot():
+    if settings.COUNTRY_SNAPSHOT_PATH:
+        write_snapshot()
+
+
+class Snapshot:
+    """A mapped snapshot file. Lookups slice the mapping without parsing it."""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.stat = os.fstat(f.fileno())
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, format_version, self.version, self.count = HEADER.unpack_from(
+            self.buffer
+        )
+        if magic != MAGIC or format_version != FORMAT_VERSION:
+            raise SnapshotError(f"{path} is not a version {FORMAT_VERSION} snapshot")
+
+        self.index_start = HEADER.size
+        self.offsets_start = self.index_start + self.count * INDEX_ENTRY.size
+        self.blob_start = self.offsets_start + (self.count + 1) * OFFSET.size
+        self.view = memoryview(self.buffer)
+
+    def is_current(self, stat):
+        return (self.stat.st_ino, self.stat.st_mtime_ns) == (
+            stat.st_ino,
+            stat.st_mtime_ns,
+        )
+
+    def _uid_at(self, position):
+        start = self.index_start + position * INDEX_ENTRY.size
+        return self.buffer[start : start + 16]
+
+    def _offset(self, row):
+        position = self.offsets_start + row * OFFSET.size
+        return OFFSET.unpack_from(self.buffer, position)[0]
+
+    def all_documents(self):
+        """Return the JSON array of every country."""
+
+        return self.view[self.blob_start :]
+
+    def get_document(self, uid):
+        """Return the JSON document of the country with this uid, or None."""
+
+        key = uuid.UUID(str(uid)).bytes
+        position = bisect.bisect_left(range(self.count), key, key=self._uid_at)
+        if position == self.count or self._uid_at(position) != key:
+            return None
+
+        (_, row) = INDEX_ENTRY.unpack_from(
+            self.buffer, self.index_start + position * INDEX_ENTRY.size
+        )
+        start = self.blob_start + self._offset(row)
+        end = self.blob_start + self._offset(row + 1) - 1
+        return self.view[start:end]
+
+
+_lock = threading.Lock()
+_snapshot = None
+
+
+def get_snapshot():
+    """
+    Return the current snapshot, remapping it when the file was replaced, or
+    None when no snapshot has been written yet.
+    """
+
+    global _snapshot
+
+    path = settings.COUNTRY_SNAPSHOT_PATH
+    if not path:
+        return None
+
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+
+    snapshot = _snapshot
+    if snapshot is None or not snapshot.is_current(stat):
+        with _lock:
+            snapshot = _snapshot
+            if snapshot is None or not snapshot.is_current(stat):
+                # Requests still holding the old mapping keep it alive until
+                # they finish; it is unmapped once garbage collected.
+                snapshot = _snapshot = Snapshot(path)
+    return snapshot
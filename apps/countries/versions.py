@@ -0,0 +1,205 @@
+import hashlib
+import json
+
+from django.utils import timezone
+
+from .models import (
+    Country,
+    CountryDocument,
+    DatasetGeneration,
+    DatasetVersion,
+    DatasetVersionChange,
+)
+
+# Every this many versions, one stores its full document map so reading a
+# version replays the changes of fewer versions than this
+CHECKPOINT_INTERVAL = 16
+
+
+def document_digest(document):
+    canonical = json.dumps(
+        document, sort_keys=True, separators=(",", ":"), ensure_ascii=False
+    )
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def render_documents(generation):
+    """Render every country of a generation, keyed by uid."""
+
+    from api.serializers import CountryReadSerializer
+
+    countries = Country.all_generations.filter(
+        generation=generation
+    ).prefetch_related(*CountryReadSerializer.prefetch_lookups())
+    return {
+        document["uid"]: dict(document)
+        for document in CountryReadSerializer(countries, many=True).data
+    }
+
+
+def list_order(document):
+    """Sort key for documents matching the ordering of the Country model."""
+
+    return document["name"]["common"], document["uid"]
+
+
+def document_ids(version):
+    """Return the document id of every country in a version, keyed by uid."""
+
+    if version is None:
+        return {}
+
+    # Versions after the nearest checkpoint, oldest first
+    chain = []
+    while version.manifest is None:
+        chain.insert(0, version.pk)
+        version = version.parent
+    order = {version_id: i for i, version_id in enumerate(chain)}
+    changes = sorted(
+        DatasetVersionChange.objects.filter(version_id__in=chain).values_list(
+            "version_id", "key", "document_id"
+        ),
+        key=lambda change: order[change[0]],
+    )
+
+    documents = dict(version.manifest)
+    for _, key, document_id in changes:
+        if document_id is None:
+            documents.pop(key, None)
+        else:
+            documents[key] = document_id
+    return documents
+
+
+def documents_as_of(version):
+    """Return the country documents of a version, keyed by uid."""
+
+    ids = document_ids(version)
+    bodies = dict(
+        CountryDocument.objects.filter(id__in=ids.values()).values_list("id", "body")
+    )
+    return {key: bodies[document_id] for key, document_id in ids.items()}
+
+
+def current_version():
+    return DatasetVersion.objects.activated().first()
+
+
+def rolled_back_version():
+    """
+    Return the current version when it is not the one the active generation
+    was imported as, meaning readers were rolled back to it; None otherwise.
+    """
+
+    version = current_version()
+    if version is None:
+        return None
+
+    active = DatasetGeneration.objects.activated().first()
+    if active is not None and version.generation_id == active.pk:
+        return None
+    return version
+
+
+def store_documents(generation):
+    """
+    Store the documents of a generation that are not stored yet, and return
+    the document id of every country keyed by uid.
+
+    Documents are stored once per content hash, so a version that is never
+    recorded only leaves documents a later one can share.
+    """
+
+    documents = render_documents(generation)
+    digests = {key: document_digest(document) for key, document in documents.items()}
+    stored = dict(
+        CountryDocument.objects.filter(digest__in=digests.values()).values_list(
+            "digest", "id"
+        )
+    )
+    missing = {
+        digest: documents[key]
+        for key, digest in digests.items()
+        if digest not in stored
+    }
+    for document in CountryDocument.objects.bulk_create(
+        [CountryDocument(digest=digest, body=body) for digest, body in missing.items()]
+    ):
+        stored[document.digest] = document.id
+
+    return {key: stored[digest] for key, digest in digests.items()}
+
+
+def record_version(generation, documents):
+    """
+    Record a generation, with the documents ``store_documents`` returned, as
+    a new version on top of the current one.
+
+    Only documents that changed since the parent version get a change row.
+    Meant to run in the transaction that activates the generation, which
+    activates the version too.
+    """
+
+    parent = current_version()
+    previous = document_ids(parent)
+    changed = {
+        key: document_id
+        for key, document_id in documents.items()
+        if previous.get(key) != document_id
+    }
+    removed = set(previous) - set(documents)
+
+    depth = parent.depth + 1 if parent is not None else 0
+    if depth >= CHECKPOINT_INTERVAL:
+        depth = 0
+
+    version = DatasetVersion.objects.create(
+        parent=parent,
+        generation=generation,
+        country_count=len(documents),
+        depth=depth,
+        manifest=documents if depth == 0 else None,
+    )
+    DatasetVersionChange.objects.bulk_create(
+        [
+            DatasetVersionChange(version=version, key=key, document_id=document_id)
+            for key, document_id in changed.items()
+        ]
+        + [DatasetVersionChange(version=version, key=key) for key in removed]
+    )
+
+    return version
+
+
+def changed_since(generation, documents):
+    """
+    Return the uids whose document, as ``store_documents`` returned it,
+    differs from how the country renders in ``generation``, new uids included.
+
+    This compares against the live tables rather than the current version,
+    which differ while readers are rolled back or after API writes.
+    """
+
+    if generation is None:
+        return set(documents)
+
+    digests = dict(
+        CountryDocument.objects.filter(id__in=documents.values()).values_list(
+            "id", "digest"
+        )
+    )
+    previous = {
+        key: document_digest(document)
+        for key, document in render_documents(generation).items()
+    }
+    return {
+        key
+        for key, document_id in documents.items()
+        if previous.get(key) != digests[document_id]
+    }
+
+
+def activate_version(version):
+    """Point readers at a version. Rolling back is just activating an old one."""
+
+    DatasetVersion.objects.filter(pk=version.pk).update(activated_at=timezone.now())
@@ -0,0 +1,53 @@
+import re
+
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+re_accepts_brotli = re.compile(r"\bbr\b")
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """
+    Compress JSON responses with brotli when the client accepts it and the
+    brotli package is installed, otherwise with gzip.
+
+    Streaming responses are always gzipped, since they are compressed chunk
+    by chunk as they are sent. So is HTML, which can carry CSRF tokens and
+    needs the BREACH mitigation of ``GZipMiddleware``.
+    """
+
+    def process_response(self, request, response):
+        accept_encoding = request.META.get("HTTP_ACCEPT_ENCODING", "")
+
+        if (
+            brotli is None
+            or response.streaming
+            or not response.get("Content-Type", "").startswith("application/json")
+            or not re_accepts_brotli.search(accept_encoding)
+        ):
+            return super().process_response(request, response)
+
+        if len(response.content) < 200 or response.has_header("Content-Encoding"):
+            return response
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+
+        compressed_content = brotli.compress(response.content, quality=5)
+        if len(compressed_content) >= len(response.content):
+            return response
+
+        response.content = compressed_content
+        response.headers["Content-Length"] = str(len(response.content))
+
+        # Weaken any strong ETag, the representation is no longer byte-identical
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response.headers["ETag"] = "W/" + etag
+
+        response.headers["Content-Encoding"] = "br"
+        return response
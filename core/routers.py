@@ -0,0 +1,100 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.urls import Resolver404, resolve
+
+PRIMARY_DATABASE = "default"
+PIN_COOKIE_NAME = "pin_primary"
+
+_pinned_to_primary = ContextVar("pinned_to_primary", default=False)
+
+
+@contextmanager
+def use_primary():
+    """Route every read inside the block to the primary database."""
+
+    token = _pinned_to_primary.set(True)
+    try:
+        yield
+    finally:
+        _pinned_to_primary.reset(token)
+
+
+def is_pinned_to_primary():
+    return _pinned_to_primary.get()
+
+
+class PrimaryReplicaRouter:
+    """
+    Send writes to the primary database and spread reads over the replicas.
+
+    Reads fall back to the primary when no replica is configured, when the
+    current context is pinned with ``use_primary``, or inside a transaction
+    on the primary, which must see its own uncommitted writes.
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.REPLICA_DATABASES
+        if (
+            not replicas
+            or is_pinned_to_primary()
+            or connections[PRIMARY_DATABASE].in_atomic_block
+        ):
+            return PRIMARY_DATABASE
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY_DATABASE
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Every alias holds the same data, so objects may relate across them
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == PRIMARY_DATABASE
+
+
+class PrimaryPinningMiddleware:
+    """
+    Pin reads to the primary for unsafe requests, and for a short window after
+    them, so a client always reads its own writes despite replication lag.
+
+    Views that only read despite an unsafe method, such as a POST carrying a
+    batch of lookups, set ``read_only = True`` and are not pinned.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def is_unsafe(self, request):
+        if request.method in ("GET", "HEAD", "OPTIONS"):
+            return False
+
+        try:
+            match = resolve(request.path_info, getattr(request, "urlconf", None))
+        except Resolver404:
+            return True
+        view_class = getattr(match.func, "view_class", None)
+        return not getattr(view_class, "read_only", False)
+
+    def __call__(self, request):
+        unsafe = self.is_unsafe(request)
+
+        if not (unsafe or PIN_COOKIE_NAME in request.COOKIES):
+            return self.get_response(request)
+
+        with use_primary():
+            response = self.get_response(request)
+
+        if unsafe:
+            response.set_cookie(
+                PIN_COOKIE_NAME,
+                "1",
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -31,12 +32,14 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "core.compression.CompressionMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "core.routers.PrimaryPinningMiddleware",
 ]
 
 ROOT_URLCONF = "core.urls"
@@ -64,14 +67,99 @@ WSGI_APPLICATION = "core.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# SQLite runs in WAL mode so readers never block on the writer, with a busy
+# timeout instead of failing immediately with "database is locked".
+SQLITE_READ_PRAGMAS = (
+    "PRAGMA mmap_size=268435456;"
+    "PRAGMA cache_size=-32000;"
+    "PRAGMA temp_store=MEMORY;"
+)
+SQLITE_WRITE_PRAGMAS = "PRAGMA journal_mode=WAL;PRAGMA synchronous=NORMAL;"
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        "CONN_MAX_AGE": 600,
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {
+            "init_command": SQLITE_WRITE_PRAGMAS + SQLITE_READ_PRAGMAS,
+            "transaction_mode": "IMMEDIATE",
+            "timeout": 20,
+        },
     }
 }
 
 
+def sqlite_read_only(name):
+    """Settings for a read-only connection to the SQLite file ``name``."""
+
+    return {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": f"file:{name}?mode=ro",
+        "CONN_MAX_AGE": 600,
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {
+            "init_command": SQLITE_READ_PRAGMAS + "PRAGMA query_only=ON;",
+            "timeout": 20,
+        },
+        "TEST": {"MIRROR": "default"},
+    }
+
+
+# Read replicas, as a comma separated list of database files, e.g.
+# DATABASE_REPLICAS=replica1.sqlite3,replica2.sqlite3. Without replicas, reads
+# use a read-only connection to the primary database file. Migrations only run
+# on the primary, so copy it to the replica files with `manage.py
+# seed_replicas` after migrating, and again after every write to replicate.
+REPLICA_DATABASES = []
+REPLICA_FILES = {}
+for index, name in enumerate(
+    filter(None, os.environ.get("DATABASE_REPLICAS", "").split(",")), start=1
+):
+    alias = f"replica{index}"
+    REPLICA_FILES[alias] = BASE_DIR / name.strip()
+    DATABASES[alias] = sqlite_read_only(REPLICA_FILES[alias])
+    REPLICA_DATABASES.append(alias)
+
+if not REPLICA_DATABASES:
+    DATABASES["readonly"] = sqlite_read_only(DATABASES["default"]["NAME"])
+    REPLICA_DATABASES.append("readonly")
+
+DATABASE_ROUTERS = ["core.routers.PrimaryReplicaRouter"]
+
+# How long reads stay on the primary after a client's write
+REPLICA_PIN_SECONDS = 15
+
+# Rendered dataset shared by all workers through mmap, rewritten on every
+# write. Set to None to always serve reads from the database.
+COUNTRY_SNAPSHOT_PATH = BASE_DIR / "countries.snapshot"
+
+
+# Responses of the read endpoints are cached in files so that every worker
+# shares them; point COUNTRY_CACHE_ALIAS at "default" for a per-process cache.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "countries": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": BASE_DIR / ".cache" / "countries",
+        "OPTIONS": {"MAX_ENTRIES": 2000},
+    },
+}
+
+COUNTRY_CACHE_ALIAS = "countries"
+
+
+REST_FRAMEWORK = {
+    "DEFAULT_RENDERER_CLASSES": [
+        "api.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 